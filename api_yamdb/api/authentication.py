@@ -0,0 +1,73 @@
+"""
+Аутентификация по JWT без обращения к БД.
+
+Токен содержит имя, роль и флаги пользователя (включая is_active),
+поэтому пользователь запроса строится из токена. Чтобы понижение роли
+или блокировка действовали сразу, при изменении этих полей выданные
+токены отзываются
+(users/revocations.py), а отзыв проверяется по словарю в памяти процесса.
+"""
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+
+from users.models import User
+from users.revocations import revocations
+
+USER_CLAIMS = ('username', 'role', 'is_superuser', 'is_staff', 'is_active')
+
+
+def issue_token(user):
+    """Токен доступа с моментом выдачи и правами пользователя."""
+    token = AccessToken.for_user(user)
+    # Дробные секунды: токен, выданный сразу после отзыва, действителен.
+    token['iat'] = token.current_time.timestamp()
+    for claim in USER_CLAIMS:
+        token[claim] = getattr(user, claim)
+    return token
+
+
+def issued_at(token):
+    if 'iat' in token:
+        return datetime_from_epoch(token['iat'])
+    # Токены, выданные до появления iat: момент выдачи восстанавливается
+    # по сроку действия.
+    return (datetime_from_epoch(token['exp'])
+            - api_settings.ACCESS_TOKEN_LIFETIME)
+
+
+class RevocableJWTAuthentication(JWTAuthentication):
+    """
+    Отклоняет отозванные токены и берёт пользователя из токена.
+    Для токенов без прав пользователя (выданных раньше) пользователь,
+    как и прежде, загружается из БД.
+    """
+
+    def get_validated_token(self, raw_token):
+        token = super().get_validated_token(raw_token)
+        user_id = token.get(api_settings.USER_ID_CLAIM)
+        if user_id is not None and revocations.is_revoked(
+                user_id, issued_at(token)):
+            raise InvalidToken({
+                'detail': 'Токен отозван, получите новый.',
+                'code': 'token_revoked',
+            })
+        return token
+
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_CLAIMS):
+            return super().get_user(validated_token)
+        if not validated_token['is_active']:
+            raise AuthenticationFailed(
+                'Пользователь неактивен.', code='user_inactive')
+        user = User(
+            pk=validated_token[api_settings.USER_ID_CLAIM],
+            **{claim: validated_token[claim] for claim in USER_CLAIMS},
+        )
+        # Объект соответствует существующей записи, а не новой.
+        user._state.adding = False
+        user._state.db = 'default'
+        return user
@@ -0,0 +1,128 @@
+"""
+Удаление категорий, произведений и пользователей фоновыми задачами.
+
+Зависимые объекты удаляются ограниченными пачками в порядке
+комментарии -> отзывы -> связи -> родитель, каждая пачка в своей
+транзакции, поэтому запрос не держит долгих блокировок на запись.
+Распределения оценок и счётчики комментариев пересчитываются в той же
+транзакции, что и пачка, поэтому прерванную задачу можно перезапустить
+с начала (api/jobs.py).
+"""
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from reviews import stats
+from reviews.models import (ArchivedComment, ArchivedReview, Category,
+                            Comments, Genre_title, Review, Title)
+from users.models import User
+from users.revocations import revoke
+from .jobs import enqueue, register
+
+
+def batch_size():
+    return getattr(settings, 'DELETION_BATCH_SIZE', 500)
+
+
+class Progress:
+    """Счётчик обработанных объектов, сохраняемый в задаче."""
+
+    def __init__(self, job, total):
+        self.job = job
+        self.processed = 0
+        job.report(0, total)
+
+    def add(self, count):
+        self.processed += count
+        self.job.report(self.processed)
+
+
+def delete_in_batches(queryset, progress, parent_field=None, rebuild=None):
+    """
+    Удаляет выборку пачками. Если задан rebuild, в транзакции пачки он
+    вызывается для значений parent_field удалённых строк.
+    """
+    while True:
+        rows = list(queryset.values_list(
+            'pk', parent_field or 'pk')[:batch_size()])
+        if not rows:
+            return
+        ids = [pk for pk, _ in rows]
+        with transaction.atomic():
+            queryset.model.objects.filter(pk__in=ids).delete()
+            if rebuild is not None:
+                rebuild(sorted({parent_id for _, parent_id in rows}))
+        progress.add(len(ids))
+
+
+def update_in_batches(queryset, progress, **values):
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size()])
+        if not ids:
+            return
+        queryset.model.objects.filter(pk__in=ids).update(**values)
+        progress.add(len(ids))
+
+
+@register('delete_title')
+def delete_title(job, title_id):
+    comments = Comments.objects.filter(review_id__title_id=title_id)
+    reviews = Review.objects.filter(title_id=title_id)
+    archived_comments = ArchivedComment.objects.filter(
+        review__title_id=title_id)
+    archived_reviews = ArchivedReview.objects.filter(title_id=title_id)
+    links = Genre_title.objects.filter(title_id=title_id)
+    querysets = (comments, reviews, archived_comments, archived_reviews,
+                 links)
+    progress = Progress(job, sum(qs.count() for qs in querysets) + 1)
+    # Распределение оценок и счётчики комментариев удаляются вместе
+    # с произведением.
+    with stats.suspended():
+        for queryset in querysets:
+            delete_in_batches(queryset, progress)
+    Title.objects.filter(pk=title_id).delete()
+    progress.add(1)
+
+
+@register('delete_user')
+def delete_user(job, user_id):
+    comments = Comments.objects.filter(
+        Q(author_id=user_id) | Q(review_id__author_id=user_id))
+    reviews = Review.objects.filter(author_id=user_id)
+    archived_comments = ArchivedComment.objects.filter(
+        Q(author_id=user_id) | Q(review__author_id=user_id))
+    archived_reviews = ArchivedReview.objects.filter(author_id=user_id)
+    querysets = (comments, reviews, archived_comments, archived_reviews)
+    progress = Progress(job, sum(qs.count() for qs in querysets) + 1)
+    with stats.suspended():
+        delete_in_batches(
+            comments, progress, 'review_id', stats.rebuild_comments)
+        delete_in_batches(reviews, progress, 'title_id', stats.rebuild)
+        delete_in_batches(archived_comments, progress)
+        delete_in_batches(
+            archived_reviews, progress, 'title_id', stats.rebuild)
+    User.objects.filter(pk=user_id).delete()
+    progress.add(1)
+
+
+@register('delete_category')
+def delete_category(job, category_id):
+    titles = Title.objects.filter(category_id=category_id)
+    progress = Progress(job, titles.count() + 1)
+    update_in_batches(titles, progress, category=None)
+    Category.objects.filter(pk=category_id).delete()
+    progress.add(1)
+
+
+def schedule_deletion(instance):
+    """Ставит удаление объекта в очередь и возвращает задачу."""
+    if isinstance(instance, Title):
+        return enqueue('delete_title', title_id=instance.pk)
+    if isinstance(instance, User):
+        # Пользователь не должен действовать, пока удаляются его данные.
+        User.objects.filter(pk=instance.pk).update(is_active=False)
+        revoke(instance.pk)
+        return enqueue('delete_user', user_id=instance.pk)
+    if isinstance(instance, Category):
+        return enqueue('delete_category', category_id=instance.pk)
+    raise TypeError(f'Фоновое удаление {type(instance)} не поддерживается')
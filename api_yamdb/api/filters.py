@@ -1,5 +1,6 @@
 from django_filters import rest_framework as filters
 
+from reviews import registry
 from reviews.models import Title
 
 
@@ -8,15 +9,18 @@ class TitlesFilter(filters.FilterSet):
         field_name='name',
         lookup_expr='icontains'
     )
-    category = filters.CharFilter(
-        field_name='category__slug',
-        lookup_expr='icontains'
-    )
-    genre = filters.CharFilter(
-        field_name='genre__slug',
-        lookup_expr='icontains'
-    )
+    category = filters.CharFilter(method='filter_category')
+    genre = filters.CharFilter(method='filter_genre')
 
     class Meta:
         model = Title
         fields = ['name', 'year', 'genre', 'category']
+
+    def filter_category(self, queryset, name, value):
+        return queryset.filter(
+            category_id__in=registry.categories.ids_containing(value))
+
+    def filter_genre(self, queryset, name, value):
+        return queryset.filter(
+            genre_title__genre_id__in=registry.genres.ids_containing(value)
+        ).distinct()
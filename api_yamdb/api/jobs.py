@@ -0,0 +1,101 @@
+"""
+Очередь фоновых задач на основе модели Job.
+
+Обработчик регистрируется декоратором @register('тип') и принимает задачу
+и её параметры. Задачи выполняет воркер: manage.py run_jobs.
+
+Воркер может завершиться посреди задачи. Задача, которая дольше
+JOBS['STALE_TIMEOUT'] секунд остаётся в статусе RUNNING без отчёта о
+прогрессе, возвращается в очередь, а после JOBS['MAX_ATTEMPTS'] попыток
+помечается как FAILED. Поэтому обработчик должен допускать повторный
+запуск с начала и регулярно сообщать о прогрессе (Job.report).
+"""
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+HANDLERS = {}
+
+
+def get_config():
+    config = {'STALE_TIMEOUT': 600, 'MAX_ATTEMPTS': 3}
+    config.update(getattr(settings, 'JOBS', {}))
+    return config
+
+
+def register(kind):
+    def decorator(handler):
+        HANDLERS[kind] = handler
+        return handler
+    return decorator
+
+
+def enqueue(kind, **params):
+    if kind not in HANDLERS:
+        raise ValueError(f'Неизвестный тип задачи: {kind}')
+    return Job.objects.create(kind=kind, payload=json.dumps(params))
+
+
+def claim(job):
+    """
+    Захватывает задачу атомарным UPDATE, чтобы несколько воркеров
+    не выполнили одну и ту же задачу.
+    """
+    return Job.objects.filter(pk=job.pk, status=Job.PENDING).update(
+        status=Job.RUNNING, attempts=F('attempts') + 1,
+        updated=timezone.now()) == 1
+
+
+def recover_stale():
+    """
+    Возвращает в очередь задачи, брошенные воркером в статусе RUNNING,
+    а исчерпавшие попытки помечает как FAILED. Возвращает число задач,
+    поставленных в очередь повторно.
+    """
+    config = get_config()
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        updated__lt=now - timedelta(seconds=config['STALE_TIMEOUT']))
+    failed = stale.filter(attempts__gte=config['MAX_ATTEMPTS']).update(
+        status=Job.FAILED, updated=now,
+        error='Воркер не завершил задачу за отведённые попытки')
+    requeued = stale.filter(attempts__lt=config['MAX_ATTEMPTS']).update(
+        status=Job.PENDING, updated=now)
+    if failed or requeued:
+        logger.warning(
+            'Зависшие задачи: в очередь - %s, с ошибкой - %s',
+            requeued, failed)
+    return requeued
+
+
+def run(job):
+    try:
+        HANDLERS[job.kind](job, **job.params)
+    except Exception as error:
+        logger.exception('Задача %s завершилась с ошибкой', job)
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED, error=repr(error), updated=timezone.now())
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE, updated=timezone.now())
+    return True
+
+
+def run_pending(limit=None):
+    """Выполняет задачи из очереди по порядку создания."""
+    recover_stale()
+    done = 0
+    for job in Job.objects.filter(status=Job.PENDING)[:limit]:
+        if claim(job):
+            run(job)
+            done += 1
+    return done
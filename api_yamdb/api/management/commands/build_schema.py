@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api import schema
+
+
+class Command(BaseCommand):
+    help = 'Генерирует схему OpenAPI и сохраняет её в API_DOCS["SCHEMA_DIR"].'
+
+    def handle(self, *args, **options):
+        for path in schema.build():
+            self.stdout.write(f'Схема сохранена: {path}')
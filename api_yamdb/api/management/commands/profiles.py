@@ -0,0 +1,35 @@
+import os
+
+from django.core.management.base import BaseCommand
+
+from api import profiling
+
+
+class Command(BaseCommand):
+    help = ('Список сохранённых профилей запросов (collapsed stacks) или '
+            'выпуск токена для заголовка X-Profile.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--token', metavar='LABEL', nargs='?', const='manual',
+            help='Выпустить подписанный токен для заголовка X-Profile.')
+        parser.add_argument(
+            '--top', type=int, default=0,
+            help='Показать самые частые стеки последнего профиля.')
+
+    def handle(self, *args, **options):
+        if options['token']:
+            self.stdout.write(profiling.make_token(options['token']))
+            return
+        profiles = profiling.list_profiles()
+        for path in profiles:
+            samples = 0
+            with open(path) as file:
+                for line in file:
+                    samples += int(line.rsplit(' ', 1)[1])
+            self.stdout.write(
+                f'{os.path.basename(path)}\t{samples} samples')
+        if options['top'] and profiles:
+            with open(profiles[-1]) as file:
+                for line in file.readlines()[:options['top']]:
+                    self.stdout.write(line.rstrip())
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.jobs import run_pending
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить накопившиеся задачи и завершиться.')
+        parser.add_argument(
+            '--interval', type=float, default=5,
+            help='Пауза между опросами очереди, секунды.')
+
+    def handle(self, *args, **options):
+        while True:
+            done = run_pending()
+            if done:
+                self.stdout.write(f'Выполнено задач: {done}')
+            if options['once']:
+                return
+            if not done:
+                time.sleep(options['interval'])
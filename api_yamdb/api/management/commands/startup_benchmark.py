@@ -0,0 +1,118 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Выполняется в отдельном процессе: импорт WSGI-приложения, два запроса
+# и потребление памяти. Результат печатается в stdout в формате JSON.
+BOOT_SCRIPT = '''
+import json, resource, sys, time
+
+
+def read_rss():
+    try:
+        with open('/proc/self/status') as status_file:
+            for line in status_file:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+started = time.perf_counter()
+import api_yamdb.wsgi
+booted = time.perf_counter()
+rss = read_rss()
+
+from django.test import Client
+
+client = Client()
+requests = []
+for _ in range(2):
+    request_started = time.perf_counter()
+    status = client.get(sys.argv[1]).status_code
+    requests.append(time.perf_counter() - request_started)
+
+print(json.dumps({
+    'boot': booted - started,
+    'first_request': requests[0],
+    'second_request': requests[1],
+    'status': status,
+    'rss_kb': rss,
+}))
+'''
+
+MODES = (
+    ('с прогревом', 'true'),
+    ('без прогрева', 'false'),
+)
+
+
+def parse_importtime(output):
+    """Собственное время импорта (мкс) по пакетам верхнего уровня."""
+    packages = Counter()
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_time, _, name = line[len('import time:'):].split('|')
+        packages[name.strip().split('.')[0]] += int(self_time)
+    return packages
+
+
+class Command(BaseCommand):
+    help = ('Замеряет запуск воркера в отдельных процессах: время импорта '
+            'по пакетам (python -X importtime), время загрузки WSGI-'
+            'приложения, первого и второго запроса и RSS после запуска - '
+            'с прогревом (api/warmup.py) и без него.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/v1/titles/')
+        parser.add_argument('--repeat', type=int, default=3)
+        parser.add_argument('--top', type=int, default=15)
+
+    def run(self, path, warmup):
+        env = dict(os.environ, WARMUP_ENABLED=warmup)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'api_yamdb.settings')
+        process = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT, path],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True)
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        result = json.loads(process.stdout.strip().splitlines()[-1])
+        return result, parse_importtime(process.stderr)
+
+    def handle(self, *args, **options):
+        imports = None
+        for title, warmup in MODES:
+            results = []
+            for _ in range(options['repeat']):
+                result, packages = self.run(options['path'], warmup)
+                results.append(result)
+                if imports is None:
+                    imports = packages
+
+            def median(key):
+                return statistics.median(result[key] for result in results)
+
+            self.stdout.write(
+                f'{title} (медиана из {len(results)}, '
+                f'GET {options["path"]} -> {results[-1]["status"]}):\n'
+                f'  загрузка приложения: {median("boot") * 1000:.1f} мс\n'
+                f'  первый запрос:       '
+                f'{median("first_request") * 1000:.1f} мс\n'
+                f'  второй запрос:       '
+                f'{median("second_request") * 1000:.1f} мс\n'
+                f'  RSS после запуска:   {median("rss_kb") / 1024:.1f} МБ')
+        total = sum(imports.values())
+        self.stdout.write(
+            f'Время импорта: {total / 1000:.1f} мс, по пакетам:')
+        for package, microseconds in imports.most_common(options['top']):
+            self.stdout.write(
+                f'  {package:<30} {microseconds / 1000:8.1f} мс '
+                f'{microseconds / total:6.1%}')
@@ -0,0 +1,93 @@
+import threading
+import time
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import JsonResponse
+
+from api_yamdb import metrics
+
+
+class LoadSheddingMiddleware:
+    """
+    Сброс нагрузки: если число одновременно обрабатываемых воркером
+    запросов достигло MAX_CONCURRENT_REQUESTS, новый запрос ждёт
+    освобождения слота не дольше QUEUE_TIMEOUT секунд, после чего
+    получает ответ 503 с заголовком Retry-After.
+    Отключается, если MAX_CONCURRENT_REQUESTS не задан.
+
+    Лимит действует в пределах процесса, поэтому работает только с
+    потоковыми воркерами, у которых потоков больше лимита (gunicorn
+    --worker-class gthread --threads 32 при лимите 16): лишние потоки
+    быстро отвечают 503, а не ждут в очереди. Синхронный воркер
+    обрабатывает один запрос за раз, лимит не достигается, и перегрузка
+    копится в очереди сокета.
+    """
+
+    def __init__(self, get_response):
+        config = getattr(settings, 'LOAD_SHEDDING', {})
+        limit = config.get('MAX_CONCURRENT_REQUESTS')
+        if not limit:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.queue_timeout = config.get('QUEUE_TIMEOUT', 0)
+        self.retry_after = config.get('RETRY_AFTER', 1)
+        self._slots = threading.BoundedSemaphore(limit)
+
+    def __call__(self, request):
+        if self.queue_timeout:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        else:
+            acquired = self._slots.acquire(blocking=False)
+        if not acquired:
+            return self.reject()
+        try:
+            return self.get_response(request)
+        finally:
+            self._slots.release()
+
+    def reject(self):
+        metrics.SHED.inc()
+        response = JsonResponse(
+            {'detail': 'Сервер перегружен, повторите запрос позже.'},
+            status=HTTPStatus.SERVICE_UNAVAILABLE)
+        response['Retry-After'] = str(self.retry_after)
+        return response
+
+
+class QueryCounter:
+    """Обёртка выполнения SQL, считающая запросы к БД."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """
+    Считает для каждого маршрута число запросов, время обработки и
+    число запросов к БД. Маршрут - имя URL (например, titles-list).
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = QueryCounter()
+        started = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - started
+        match = request.resolver_match
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        metrics.REQUESTS.labels(
+            route, request.method, response.status_code).inc()
+        metrics.LATENCY.labels(route, request.method).observe(elapsed)
+        metrics.DB_QUERIES.labels(route, request.method).observe(
+            queries.count)
+        return response
@@ -0,0 +1,163 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+from users.models import User
+
+
+class Job(models.Model):
+    """
+    Фоновая задача. Создаётся в запросе через api.jobs.enqueue() и
+    выполняется воркером (manage.py run_jobs). Хранит параметры задачи
+    в виде JSON (payload), прогресс выполнения (processed из total) и
+    число попыток. updated служит отметкой активности воркера.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = [
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    kind = models.CharField(
+        max_length=50,
+        verbose_name='Тип задачи',
+    )
+    payload = models.TextField(
+        default='{}',
+        verbose_name='Параметры',
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        db_index=True,
+        verbose_name='Статус',
+    )
+    total = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Всего объектов',
+    )
+    processed = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Обработано объектов',
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name='Попыток выполнения',
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name='Ошибка',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Создана',
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Обновлена',
+    )
+
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['id']
+
+    def __str__(self):
+        return f'{self.kind} #{self.pk} ({self.status})'
+
+    @property
+    def params(self):
+        return json.loads(self.payload)
+
+    def report(self, processed, total=None):
+        """Сохраняет прогресс, не затрагивая остальные поля задачи."""
+        self.processed = processed
+        if total is not None:
+            self.total = total
+        Job.objects.filter(pk=self.pk).update(
+            processed=self.processed, total=self.total,
+            updated=timezone.now())
+
+
+class ModerationLog(models.Model):
+    """
+    Журнал массовой модерации: кто, когда и с какими фильтрами скрыл,
+    вернул или удалил отзывы либо комментарии, и сколько записей
+    затронуто. Большие операции выполняются фоновой задачей job.
+    """
+    HIDE = 'hide'
+    UNHIDE = 'unhide'
+    DELETE = 'delete'
+    ACTIONS = [
+        (HIDE, 'Скрыть'),
+        (UNHIDE, 'Показать'),
+        (DELETE, 'Удалить'),
+    ]
+    REVIEWS = 'reviews'
+    COMMENTS = 'comments'
+    TARGETS = [
+        (REVIEWS, 'Отзывы'),
+        (COMMENTS, 'Комментарии'),
+    ]
+
+    moderator = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        related_name='+',
+        verbose_name='Модератор',
+    )
+    moderator_username = models.CharField(
+        max_length=150,
+        verbose_name='Имя модератора',
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ACTIONS,
+        verbose_name='Действие',
+    )
+    target = models.CharField(
+        max_length=10,
+        choices=TARGETS,
+        verbose_name='Объекты',
+    )
+    filters = models.TextField(
+        default='{}',
+        verbose_name='Фильтры',
+    )
+    affected = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Затронуто объектов',
+    )
+    job = models.ForeignKey(
+        Job,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='+',
+        verbose_name='Фоновая задача',
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name='Создана',
+    )
+
+    class Meta:
+        verbose_name = 'Запись журнала модерации'
+        verbose_name_plural = 'Журнал модерации'
+        ordering = ['-created']
+
+    def __str__(self):
+        return f'{self.action} {self.target} ({self.moderator_username})'
+
+    @property
+    def params(self):
+        return json.loads(self.filters)
@@ -0,0 +1,157 @@
+"""
+Массовая модерация отзывов и комментариев.
+
+Записи отбираются фильтрами (id, автор, произведение, период, фрагмент
+текста) в рабочих таблицах и в архиве (reviews/archive.py) и скрываются,
+возвращаются или удаляются пачками по DELETION_BATCH_SIZE: каждая пачка -
+один UPDATE или DELETE по списку id. Распределения оценок затронутых
+произведений и счётчики комментариев затронутых отзывов пересчитываются
+один раз на пачку, в её транзакции, а не на каждую запись, поэтому
+прерванную фоновую задачу можно перезапустить (api/jobs.py). Операция
+записывается в журнал ModerationLog; если она затрагивает больше
+MODERATION['SYNC_LIMIT'] записей, она выполняется фоновой задачей.
+"""
+import json
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from reviews import stats
+from reviews.models import ArchivedComment, ArchivedReview, Comments, Review
+from .deletion import Progress, batch_size
+from .jobs import enqueue, register
+from .models import ModerationLog
+
+# Таблицы объектов модерации: модель, поле произведения, поле родителя,
+# счётчики которого пересчитываются, и функция пересчёта. Счётчик
+# комментариев архивного отзыва не хранится, а считается при чтении.
+TABLES = {
+    ModerationLog.REVIEWS: (
+        (Review, 'title_id', 'title_id', stats.rebuild),
+        (ArchivedReview, 'title_id', 'title_id', stats.rebuild),
+    ),
+    ModerationLog.COMMENTS: (
+        (Comments, 'review_id__title_id', 'review_id',
+         stats.rebuild_comments),
+        (ArchivedComment, 'review__title_id', 'review_id', None),
+    ),
+}
+
+
+def get_config():
+    config = {'SYNC_LIMIT': 500}
+    config.update(getattr(settings, 'MODERATION', {}))
+    return config
+
+
+def filter_queryset(log, queryset, title_field):
+    """Записи таблицы, к которым применяется действие из журнала."""
+    filters = log.params
+    if 'ids' in filters:
+        queryset = queryset.filter(pk__in=filters['ids'])
+    if 'author' in filters:
+        queryset = queryset.filter(author__username=filters['author'])
+    if 'title' in filters:
+        queryset = queryset.filter(**{title_field: filters['title']})
+    if 'since' in filters:
+        queryset = queryset.filter(
+            pub_date__gte=parse_datetime(filters['since']))
+    if 'until' in filters:
+        queryset = queryset.filter(
+            pub_date__lt=parse_datetime(filters['until']))
+    if 'text' in filters:
+        queryset = queryset.filter(text__icontains=filters['text'])
+    if log.action == ModerationLog.HIDE:
+        queryset = queryset.filter(is_hidden=False)
+    elif log.action == ModerationLog.UNHIDE:
+        queryset = queryset.filter(is_hidden=True)
+    return queryset
+
+
+def select(log):
+    """
+    Выборки рабочей и архивной таблиц вместе с полем родителя и функцией
+    пересчёта его счётчиков.
+    """
+    return [
+        (filter_queryset(log, model.objects.all(), title_field),
+         parent_field, rebuild)
+        for model, title_field, parent_field, rebuild in TABLES[log.target]]
+
+
+def count(log, limit=None):
+    """
+    Число записей, затрагиваемых операцией. С limit каждая таблица
+    считается не дальше limit + 1 записи: этого достаточно, чтобы понять,
+    превышен ли limit.
+    """
+    if limit is None:
+        return sum(queryset.count() for queryset, _, _ in select(log))
+    return sum(
+        queryset.order_by()[:limit + 1].count()
+        for queryset, _, _ in select(log))
+
+
+def apply_batches(log, queryset, parent_field, rebuild, progress):
+    model = queryset.model
+    queryset = queryset.order_by('pk')
+    affected = 0
+    last = 0
+    while True:
+        batch = list(queryset.filter(pk__gt=last).values_list(
+            'pk', parent_field)[:batch_size()])
+        if not batch:
+            return affected
+        last = batch[-1][0]
+        ids = [pk for pk, _ in batch]
+        with transaction.atomic():
+            objects = model.objects.filter(pk__in=ids)
+            if log.action == ModerationLog.DELETE:
+                objects.delete()
+            else:
+                objects.update(is_hidden=log.action == ModerationLog.HIDE)
+            if rebuild is not None:
+                rebuild(sorted({parent_id for _, parent_id in batch}))
+        affected += len(ids)
+        if progress is not None:
+            progress.add(len(ids))
+
+
+def apply(log, progress=None):
+    """Выполняет действие пачками и сохраняет число затронутых записей."""
+    affected = 0
+    with stats.suspended():
+        for queryset, parent_field, rebuild in select(log):
+            affected += apply_batches(
+                log, queryset, parent_field, rebuild, progress)
+    log.affected = affected
+    ModerationLog.objects.filter(pk=log.pk).update(affected=affected)
+    return log
+
+
+def moderate(user, action, target, filters):
+    """
+    Записывает операцию в журнал и выполняет её сразу или, если она
+    затрагивает много записей, ставит в очередь. Возвращает запись журнала.
+    """
+    log = ModerationLog.objects.create(
+        moderator=user,
+        moderator_username=user.username,
+        action=action,
+        target=target,
+        filters=json.dumps(filters, cls=DjangoJSONEncoder),
+    )
+    limit = get_config()['SYNC_LIMIT']
+    if count(log, limit) > limit:
+        log.job = enqueue('moderate', log_id=log.pk)
+        ModerationLog.objects.filter(pk=log.pk).update(job=log.job)
+        return log
+    return apply(log)
+
+
+@register('moderate')
+def run_moderation(job, log_id):
+    log = ModerationLog.objects.get(pk=log_id)
+    apply(log, Progress(job, count(log)))
@@ -0,0 +1,284 @@
+import heapq
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from api_yamdb import metrics
+from reviews.paginators import estimate_count
+
+
+class KeysetPagination(BasePagination):
+    """
+    Постраничный вывод по ключу (pub_date, id) от новых записей к старым.
+    Вместо OFFSET следующая страница выбирается условием по последней
+    записи предыдущей, поэтому запрос использует индекс (..., pub_date)
+    и не замедляется на дальних страницах.
+    Может объединять несколько выборок (например, отзывы и комментарии):
+    записи с одинаковым pub_date упорядочиваются по номеру выборки.
+    """
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Некорректный курсор.'
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            pub_date, stream, pk = b64decode(
+                encoded.encode('ascii')).decode('ascii').split('|')
+            position = (parse_datetime(pub_date), int(stream), int(pk))
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if position[0] is None:
+            raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, position):
+        pub_date, stream, pk = position
+        return b64encode(
+            f'{pub_date.isoformat()}|{stream}|{pk}'.encode('ascii')
+        ).decode('ascii')
+
+    def seek(self, queryset, stream, cursor):
+        """Записи выборки stream, следующие за курсором."""
+        queryset = queryset.order_by('-pub_date', '-pk')
+        if cursor is None:
+            return queryset
+        pub_date, cursor_stream, pk = cursor
+        if stream < cursor_stream:
+            return queryset.filter(pub_date__lte=pub_date)
+        if stream > cursor_stream:
+            return queryset.filter(pub_date__lt=pub_date)
+        return queryset.filter(
+            Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.paginate_querysets([queryset], request, view)
+
+    def paginate_querysets(self, querysets, request, view=None):
+        self.request = request
+        cursor = self.decode_cursor(request)
+        limit = self.page_size + 1
+        streams = [
+            [((obj.pub_date, stream, obj.pk), obj)
+             for obj in self.seek(queryset, stream, cursor)[:limit]]
+            for stream, queryset in enumerate(querysets)
+        ]
+        page = list(heapq.merge(
+            *streams, key=lambda item: item[0], reverse=True))[:limit]
+        self.has_next = len(page) > self.page_size
+        page = page[:self.page_size]
+        self.last_position = page[-1][0] if page else None
+        return [obj for _, obj in page]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(), self.cursor_query_param,
+            self.encode_cursor(self.last_position))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+
+# Отметка в кэше: таблица небольшая и считается точно.
+EXACT = -1
+
+
+def get_count_config():
+    config = {
+        'CACHE_TIMEOUT': 60,
+        'EXACT_COUNT_LIMIT': 10000,
+        'FILTERED_COUNT_LIMIT': 1000,
+    }
+    config.update(getattr(settings, 'PAGINATION_COUNT', {}))
+    return config
+
+
+def count_queryset(queryset):
+    """
+    Выборка для подсчёта: без сортировки и без аннотаций, не влияющих на
+    число строк (например, рейтинга), которые иначе вычислялись бы для
+    каждой подсчитываемой строки.
+    """
+    queryset = queryset.order_by()
+    annotations = queryset.query.annotations
+    for alias, annotation in list(annotations.items()):
+        if not annotation.contains_aggregate:
+            del annotations[alias]
+    return queryset.values('pk')
+
+
+class EstimatedCountPage(Page):
+
+    def has_next(self):
+        # При приблизительном числе следующая страница есть, пока
+        # текущая заполнена целиком.
+        if self.paginator.is_estimate:
+            return len(self.object_list) == self.paginator.per_page
+        return super().has_next()
+
+
+class FixedCountPaginator(Paginator):
+    """Пагинатор с заранее известным (возможно, приблизительным) числом."""
+
+    def __init__(self, object_list, per_page, count, is_estimate=False,
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self._count = count
+        self.is_estimate = is_estimate
+
+    @property
+    def count(self):
+        return self._count
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            # Приблизительное число может быть меньше настоящего:
+            # страница за его пределами проверяется в page().
+            if not self.is_estimate or int(number) < 1:
+                raise
+            return int(number)
+
+    def page(self, number):
+        # При приблизительном числе последняя страница не обрезается
+        # по нему: на ней выводится всё, что есть в выборке.
+        number = self.validate_number(number)
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page])
+        if not object_list and number > max(self.num_pages, 1):
+            raise EmptyPage('That page contains no results')
+        return EstimatedCountPage(object_list, number, self)
+
+
+class CountedPageNumberPagination(PageNumberPagination):
+    """
+    Постраничный вывод без COUNT(*) по всей выборке на каждый запрос.
+
+    Число записей берётся:
+    - для выборки без параметров фильтрации - из поддерживаемого
+      счётчика, если вьюсет определяет get_maintained_count() (например,
+      число отзывов произведения из ScoreHistogram); если на странице
+      оказывается больше записей, чем в счётчике (он отстал от таблицы),
+      число считается так же, как для отфильтрованной выборки;
+    - для всей таблицы - точным подсчётом, а для таблиц больше
+      EXACT_COUNT_LIMIT строк - из статистики PostgreSQL, закэшированной
+      на CACHE_TIMEOUT секунд;
+    - для отфильтрованной выборки - подсчётом не дальше
+      FILTERED_COUNT_LIMIT записей (и не дальше запрошенной страницы).
+    Если число приблизительное, в ответе count_is_estimate = true.
+    """
+    ignored_query_params = ('format',)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        self.count_is_maintained = False
+        self.count, self.count_is_estimate = self.get_count(
+            queryset, request, view, page_size)
+        # Страница за пределами поддерживаемого счётчика запрашивается,
+        # как при приблизительном числе: счётчик проверяется по ней.
+        self.django_paginator_class = partial(
+            FixedCountPaginator, count=self.count,
+            is_estimate=self.count_is_estimate or self.count_is_maintained)
+        page = super().paginate_queryset(queryset, request, view)
+        if self.count_is_maintained:
+            self.check_maintained_count(queryset, request, page_size)
+        return page
+
+    def check_maintained_count(self, queryset, request, page_size):
+        seen = (self.page.number - 1) * page_size + len(self.page)
+        if seen > self.count:
+            self.count, self.count_is_estimate = self.get_bounded_count(
+                queryset, request, page_size)
+        # Ссылки на соседние страницы строятся по проверенному числу.
+        self.page.paginator = FixedCountPaginator(
+            queryset, page_size, count=self.count,
+            is_estimate=self.count_is_estimate)
+
+    def is_filtered(self, request):
+        ignored = {self.page_query_param, self.page_size_query_param,
+                   *self.ignored_query_params}
+        return any(param not in ignored for param in request.query_params)
+
+    def get_count(self, queryset, request, view, page_size):
+        """Возвращает число записей и признак того, что оно приблизительное."""
+        if not self.is_filtered(request):
+            get_maintained_count = getattr(
+                view, 'get_maintained_count', None)
+            count = get_maintained_count() if get_maintained_count else None
+            if count is not None:
+                self.count_is_maintained = True
+                return count, False
+            if not queryset.query.where:
+                return self.get_table_count(queryset)
+        return self.get_bounded_count(queryset, request, page_size)
+
+    def get_table_count(self, queryset):
+        """
+        Кэшируется только оценка большой таблицы. Небольшая таблица
+        считается точно на каждый запрос: в кэше остаётся лишь отметка,
+        что оценку запрашивать не нужно.
+        """
+        config = get_count_config()
+        key = f'pagination-count:{queryset.model._meta.label_lower}'
+        count = cache.get(key)
+        if count is not None and count != EXACT:
+            metrics.CACHE_LOOKUPS.labels('pagination_count', 'hit').inc()
+            return count, True
+        if count is None:
+            metrics.CACHE_LOOKUPS.labels('pagination_count', 'miss').inc()
+            count = estimate_count(queryset)
+            if count is not None and count >= config['EXACT_COUNT_LIMIT']:
+                cache.set(key, count, config['CACHE_TIMEOUT'])
+                return count, True
+            cache.set(key, EXACT, config['CACHE_TIMEOUT'])
+        # Выборка без условий: считаются строки самой таблицы.
+        return queryset.model._base_manager.db_manager(
+            queryset.db).count(), False
+
+    def get_bounded_count(self, queryset, request, page_size):
+        page_number = request.query_params.get(self.page_query_param, 1)
+        try:
+            page_number = max(int(page_number), 1)
+        except ValueError:
+            page_number = 1
+        limit = max(get_count_config()['FILTERED_COUNT_LIMIT'],
+                    page_number * page_size + 1)
+        count = count_queryset(queryset)[:limit].count()
+        return count, count >= limit
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('count_is_estimate', self.count_is_estimate),
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['properties']['count_is_estimate'] = {
+            'type': 'boolean',
+        }
+        return response_schema
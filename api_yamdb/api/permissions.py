@@ -1,3 +1,5 @@
+from django.conf import settings
+from django.utils.crypto import constant_time_compare
 from rest_framework.permissions import BasePermission, SAFE_METHODS
 
 
@@ -44,3 +46,25 @@ class IsModeratorAdminOrReadOnly(BasePermission):
             or request.user.is_admin
             or request.user.is_moderator
             or request.user.is_superuser)
+
+
+class IsModeratorOrAdmin(BasePermission):
+    """
+    Доступ только модераторам, администраторам и суперюзерам.
+    """
+    def has_permission(self, request, view):
+        return request.user.is_authenticated and (
+            request.user.is_admin
+            or request.user.is_moderator
+            or request.user.is_superuser)
+
+
+class HasMetricsToken(BasePermission):
+    """
+    Доступ к метрикам для сборщика (Prometheus) по статическому токену
+    из настройки METRICS_TOKEN в заголовке X-Metrics-Token.
+    """
+    def has_permission(self, request, view):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        return bool(token) and constant_time_compare(
+            request.META.get('HTTP_X_METRICS_TOKEN', ''), token)
@@ -0,0 +1,160 @@
+"""
+Профилирование отдельных запросов в рабочем окружении.
+
+Запрос профилируется, если в нём передан заголовок X-Profile с
+подписанным токеном (manage.py profiles --token) или если для его маршрута
+в PROFILING['SAMPLING'] задана доля профилируемых запросов. Стек потока,
+обрабатывающего запрос, опрашивается фоновым потоком каждые INTERVAL
+секунд. Результат сохраняется в формате collapsed stacks (по строке
+"функция;функция;... число" на стек), пригодном для flamegraph.pl и
+speedscope. Если запрос не профилируется, издержки - одна проверка
+заголовка.
+"""
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+from django.conf import settings
+from django.core import signing
+from django.core.exceptions import MiddlewareNotUsed
+from django.utils import timezone
+
+HEADER = 'HTTP_X_PROFILE'
+SALT = 'api.profiling'
+
+
+def get_config():
+    config = {
+        'ENABLED': False,
+        'DIRECTORY': os.path.join(settings.BASE_DIR, 'profiles'),
+        'MAX_FILES': 100,
+        'INTERVAL': 0.005,
+        'TOKEN_MAX_AGE': 3600,
+        'SAMPLING': {},
+    }
+    config.update(getattr(settings, 'PROFILING', {}))
+    return config
+
+
+def make_token(label='manual'):
+    return signing.dumps({'label': label}, salt=SALT)
+
+
+def check_token(token):
+    try:
+        return signing.loads(
+            token, salt=SALT, max_age=get_config()['TOKEN_MAX_AGE'])
+    except signing.BadSignature:
+        return None
+
+
+class StackSampler(threading.Thread):
+    """Периодически снимает стек заданного потока и считает стеки."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(
+                    f'{code.co_name} '
+                    f'({os.path.basename(code.co_filename)}:'
+                    f'{code.co_firstlineno})')
+                frame = frame.f_back
+            self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+def list_profiles(directory=None):
+    directory = directory or get_config()['DIRECTORY']
+    if not os.path.isdir(directory):
+        return []
+    return sorted(
+        os.path.join(directory, name) for name in os.listdir(directory)
+        if name.endswith('.collapsed'))
+
+
+def save_profile(stacks, route, elapsed):
+    config = get_config()
+    os.makedirs(config['DIRECTORY'], exist_ok=True)
+    name = '{}_{}_{}ms.collapsed'.format(
+        timezone.now().strftime('%Y%m%dT%H%M%S%f'),
+        route.replace('/', '_'), int(elapsed * 1000))
+    path = os.path.join(config['DIRECTORY'], name)
+    with open(path, 'w') as file:
+        for stack, count in stacks.most_common():
+            file.write(f'{stack} {count}\n')
+    for old in list_profiles(config['DIRECTORY'])[:-config['MAX_FILES']]:
+        os.remove(old)
+    return path
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует запросы с подписанным заголовком X-Profile и
+    случайную долю запросов маршрутов из PROFILING['SAMPLING']
+    (например, {'title-list': 0.01}). Включается PROFILING['ENABLED'].
+    """
+
+    def __init__(self, get_response):
+        config = get_config()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sampling = config['SAMPLING']
+        self.interval = config['INTERVAL']
+
+    def __call__(self, request):
+        if HEADER in request.META and check_token(request.META[HEADER]):
+            self.start(request)
+        try:
+            response = self.get_response(request)
+        except Exception:
+            sampler = getattr(request, 'profiling_sampler', None)
+            if sampler is not None:
+                sampler.stop()
+            raise
+        sampler = getattr(request, 'profiling_sampler', None)
+        if sampler is not None:
+            self.finish(request, response, sampler)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Маршрут известен только после разбора URL, поэтому выборочное
+        # профилирование начинается с вызова представления.
+        if not self.sampling or hasattr(request, 'profiling_sampler'):
+            return None
+        rate = self.sampling.get(request.resolver_match.url_name)
+        if rate and random.random() < rate:
+            self.start(request)
+        return None
+
+    def start(self, request):
+        sampler = StackSampler(threading.get_ident(), self.interval)
+        sampler.started = time.perf_counter()
+        sampler.start()
+        request.profiling_sampler = sampler
+
+    def finish(self, request, response, sampler):
+        sampler.stop()
+        match = request.resolver_match
+        route = (match.url_name or match.view_name) if match else 'unmatched'
+        path = save_profile(
+            sampler.stacks, route, time.perf_counter() - sampler.started)
+        response['X-Profile-Saved'] = os.path.basename(path)
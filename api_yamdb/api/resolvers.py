@@ -0,0 +1,98 @@
+"""
+Разрешение родительских объектов вложенных маршрутов
+/titles/{title_id}/reviews/{review_id}/comments/.
+
+Родитель загружается один раз за запрос одним запросом к БД вместе со
+всей цепочкой (отзыв - вместе с произведением) и запоминается на объекте
+запроса, откуда его берут вьюсет, сериализаторы и permissions.
+
+Отзывы и комментарии архивного произведения (reviews/archive.py) читаются
+из архива. В рабочие таблицы они возвращаются только при записи - в
+perform_create/perform_update/perform_destroy, после проверки данных и
+прав доступа (restore_archive).
+"""
+from django.db.models import Count, Q
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+
+from reviews import archive
+from reviews.models import (ArchivedComment, ArchivedReview, Comments,
+                            Review, Title)
+
+# Архивные модели и соответствующие им рабочие.
+RESTORED_MODELS = {ArchivedReview: Review, ArchivedComment: Comments}
+
+
+def memoize(request, key, loader):
+    resolved = getattr(request, 'resolved_parents', None)
+    if resolved is None:
+        resolved = request.resolved_parents = {}
+    if key not in resolved:
+        resolved[key] = loader()
+    return resolved[key]
+
+
+class TitleChildMixin:
+    """Вьюсет объектов, вложенных в /titles/{title_id}/."""
+
+    def get_title(self):
+        return memoize(self.request, 'title', lambda: get_object_or_404(
+            Title.objects.select_related('histogram'),
+            pk=self.kwargs.get('title_id')))
+
+    def restore_archive(self, instance=None):
+        """
+        Возвращает данные архивного произведения в рабочие таблицы перед
+        записью. Архивный объект instance заменяется объектом рабочей
+        таблицы с тем же id, который и возвращается.
+        """
+        if instance is None:
+            title = self.get_title()
+            if title.is_archived:
+                archive.restore(title)
+            return None
+        model = RESTORED_MODELS.get(type(instance))
+        if model is None:
+            return instance
+        archive.restore(self.get_title())
+        return get_object_or_404(model, pk=instance.pk)
+
+
+class ReviewChildMixin(TitleChildMixin):
+    """Вьюсет объектов, вложенных в /titles/{title_id}/reviews/{review_id}/."""
+
+    def get_review(self):
+        review = memoize(self.request, 'review', self.load_review)
+        memoize(self.request, 'title', lambda: review.title)
+        return review
+
+    def load_review(self):
+        lookup = {
+            'pk': self.kwargs.get('review_id'),
+            'title_id': self.kwargs.get('title_id'),
+            'is_hidden': False,
+        }
+        review = Review.objects.select_related('title').filter(
+            **lookup).first()
+        if review is not None:
+            return review
+        title = get_object_or_404(Title, pk=lookup['title_id'])
+        if not title.is_archived:
+            raise Http404
+        return get_object_or_404(
+            ArchivedReview.objects.select_related('title').annotate(
+                comments_count=Count(
+                    'comments', filter=Q(comments__is_hidden=False))),
+            **lookup)
+
+    def restore_archive(self, instance=None):
+        restored = super().restore_archive(instance)
+        if instance is None and isinstance(self.get_review(), ArchivedReview):
+            # Новый объект привязывается к восстановленному отзыву.
+            self.request.resolved_parents['review'] = get_object_or_404(
+                Review.objects.select_related('title'),
+                pk=self.get_review().pk)
+        return restored
+
+    def get_title(self):
+        return self.get_review().title
@@ -0,0 +1,208 @@
+"""
+Предварительно сгенерированная схема OpenAPI.
+
+Схема строится один раз (manage.py build_schema или при первом
+обращении), сохраняется в файлы openapi-<версия>-<отпечаток>.json/.yaml
+в каталоге API_DOCS['SCHEMA_DIR'] и отдаётся из памяти процесса с ETag
+и gzip. Отпечаток - идентификатор релиза API_DOCS['RELEASE'] или, если он
+не задан, хэш исходников, из которых строится схема. Поэтому после
+выкладки нового кода старый файл не используется, а схема строится
+заново. drf_yasg импортируется только при генерации схемы и открытии UI.
+"""
+import glob
+import gzip
+import hashlib
+import os
+import re
+import threading
+from functools import lru_cache
+from importlib import import_module
+
+import django
+import rest_framework
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from api_yamdb import metrics
+
+FORMATS = {
+    'json': 'application/json',
+    'yaml': 'application/yaml',
+}
+
+SCHEMA_INFO = dict(
+    title='Yamdb API',
+    default_version='v1',
+    description=('''Документация для
+                 приложения проекта Yambd API'''),
+)
+
+# Модули, от которых зависит схема: маршруты, представления,
+# сериализаторы, фильтры и модели.
+SOURCE_MODULES = (
+    'api_yamdb.urls',
+    'api.urls',
+    'api.views',
+    'api.serializers',
+    'api.filters',
+    'api.pagination',
+    'api.permissions',
+    'reviews.models',
+    'users.models',
+)
+
+_artifacts = {}
+_lock = threading.Lock()
+
+
+def get_config():
+    config = {
+        'ENABLED': True,
+        'SCHEMA_DIR': os.path.join(settings.BASE_DIR, 'schema'),
+        'CACHE_MAX_AGE': 3600,
+    }
+    config.update(getattr(settings, 'API_DOCS', {}))
+    return config
+
+
+@lru_cache(maxsize=None)
+def fingerprint():
+    """Отпечаток кода, из которого строится схема."""
+    release = get_config().get('RELEASE')
+    if release:
+        return re.sub(r'[^\w.-]', '_', release)
+    digest = hashlib.sha256(
+        f'{django.get_version()} {rest_framework.VERSION}'.encode())
+    for name in SOURCE_MODULES:
+        with open(import_module(name).__file__, 'rb') as file:
+            digest.update(file.read())
+    return digest.hexdigest()[:16]
+
+
+def artifact_path(fmt, version=None):
+    return os.path.join(
+        get_config()['SCHEMA_DIR'],
+        f'openapi-{SCHEMA_INFO["default_version"]}-'
+        f'{version or fingerprint()}.{fmt}')
+
+
+def generate():
+    """Строит схему и возвращает её в форматах json и yaml."""
+    from drf_yasg import openapi
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+
+    info = openapi.Info(
+        contact=openapi.Contact(email='admin@admin.ru'),
+        license=openapi.License(name='BSD License'),
+        **SCHEMA_INFO,
+    )
+    schema = OpenAPISchemaGenerator(
+        info, SCHEMA_INFO['default_version']).get_schema(public=True)
+    return {
+        'json': OpenAPICodecJson(validators=[]).encode(schema),
+        'yaml': OpenAPICodecYaml(validators=[]).encode(schema),
+    }
+
+
+def save(documents):
+    """Сохраняет схему и удаляет файлы, собранные из другого кода."""
+    os.makedirs(get_config()['SCHEMA_DIR'], exist_ok=True)
+    paths = []
+    for fmt, content in documents.items():
+        path = artifact_path(fmt)
+        with open(path, 'wb') as file:
+            file.write(content)
+        paths.append(path)
+        for stale in glob.glob(artifact_path(fmt, version='*')):
+            if stale != path:
+                os.remove(stale)
+    return paths
+
+
+def build():
+    """Генерирует схему и сохраняет её в каталог SCHEMA_DIR."""
+    paths = save(generate())
+    with _lock:
+        _artifacts.clear()
+    return paths
+
+
+class Artifact:
+    """Схема в одном формате: содержимое, сжатая версия и ETag."""
+
+    def __init__(self, content, content_type):
+        self.content = content
+        self.compressed = gzip.compress(content)
+        self.content_type = content_type
+        self.etag = '"%s"' % hashlib.sha256(content).hexdigest()[:32]
+
+
+def load(fmt):
+    """
+    Возвращает схему из памяти процесса. При первом обращении читает
+    файл из SCHEMA_DIR, а если его нет - генерирует и сохраняет схему.
+    """
+    artifact = _artifacts.get(fmt)
+    if artifact is not None:
+        metrics.CACHE_LOOKUPS.labels('schema', 'hit').inc()
+        return artifact
+    metrics.CACHE_LOOKUPS.labels('schema', 'miss').inc()
+    with _lock:
+        if fmt not in _artifacts:
+            if not os.path.exists(artifact_path(fmt)):
+                documents = generate()
+                try:
+                    save(documents)
+                except OSError:
+                    pass
+                content = documents[fmt]
+            else:
+                with open(artifact_path(fmt), 'rb') as file:
+                    content = file.read()
+            _artifacts[fmt] = Artifact(content, FORMATS[fmt])
+        return _artifacts[fmt]
+
+
+def schema_view(request, format):
+    artifact = load(format.lstrip('.'))
+    if artifact.etag in request.META.get('HTTP_IF_NONE_MATCH', ''):
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        response = HttpResponse(
+            artifact.compressed, content_type=artifact.content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(
+            artifact.content, content_type=artifact.content_type)
+    response['ETag'] = artifact.etag
+    response['Cache-Control'] = (
+        f'public, max-age={get_config()["CACHE_MAX_AGE"]}')
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
+
+
+def ui_view(renderer):
+    """
+    Страница Swagger UI или ReDoc. Представление drf_yasg создаётся при
+    первом обращении; сама схема загружается страницей с адреса
+    SPEC_URL, то есть из schema_view.
+    """
+    view = None
+
+    def lazy_view(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            from drf_yasg import openapi
+            from drf_yasg.views import get_schema_view
+            from rest_framework import permissions
+
+            view = get_schema_view(
+                openapi.Info(**SCHEMA_INFO),
+                public=True,
+                permission_classes=(permissions.AllowAny,),
+            ).with_ui(renderer, cache_timeout=0)
+        return view(request, *args, **kwargs)
+
+    return lazy_view
@@ -1,12 +1,13 @@
-import regex as re
-
-from django.db.models import Avg
+import re
 
 from rest_framework import serializers
 from rest_framework.validators import UniqueTogetherValidator
 
-from reviews.models import Category, Genre, Title, Review, Comments
+from reviews import registry
+from reviews.models import (Category, Genre, Title, Review, Comments,
+                            ScoreHistogram, SimilarTitle, ArchivedComment)
 from users.models import User
+from .models import Job, ModerationLog
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -90,11 +91,38 @@ class GenreSerializer(serializers.ModelSerializer):
         model = Genre
 
 
+class RegistrySlugRelatedField(serializers.SlugRelatedField):
+    """
+    Поле связи по slug, которое ищет объекты в справочнике
+    reviews.registry, а не запросом к БД.
+    """
+
+    def __init__(self, registry, **kwargs):
+        self.registry = registry
+        kwargs.setdefault('slug_field', 'slug')
+        kwargs.setdefault('queryset', registry.model.objects.all())
+        super().__init__(**kwargs)
+
+    def use_pk_only_optimization(self):
+        return True
+
+    def to_internal_value(self, data):
+        if not isinstance(data, str):
+            self.fail('invalid')
+        obj = self.registry.get_by_slug(data)
+        if obj is None:
+            self.fail('does_not_exist', slug_name=self.slug_field,
+                      value=data)
+        return obj
+
+    def to_representation(self, value):
+        obj = self.registry.get(value.pk)
+        return obj.slug if obj is not None else None
+
+
 class TitleSerializer(serializers.ModelSerializer):
-    genre = serializers.SlugRelatedField(
-        slug_field='slug', many=True, queryset=Genre.objects.all())
-    category = serializers.SlugRelatedField(
-        slug_field='slug', queryset=Category.objects.all())
+    genre = RegistrySlugRelatedField(registry.genres, many=True)
+    category = RegistrySlugRelatedField(registry.categories)
     rating = serializers.IntegerField(read_only=True, required=False)
 
     class Meta:
@@ -105,18 +133,67 @@ class TitleSerializer(serializers.ModelSerializer):
 
 
 class TitleGetSerializer(serializers.ModelSerializer):
-    genre = GenreSerializer(read_only=True, many=True)
-    category = CategorySerializer(read_only=True)
-    rating = serializers.SerializerMethodField()
+    """
+    Сериализатор для чтения произведений. Жанры и категория берутся из
+    справочников reviews.registry по id; жанры произведения ожидаются
+    в prefetch_related('genre_title_set').
+    """
+    genre = serializers.SerializerMethodField()
+    category = serializers.SerializerMethodField()
+    rating = serializers.FloatField(read_only=True)
 
     class Meta:
         fields = ('id', 'name', 'year', 'rating',
                   'description', 'genre', 'category')
         model = Title
 
-    def get_rating(self, obj):
-        qs = obj.reviews.all()
-        return qs.aggregate(rating=Avg('score')).get('rating')
+    def get_genre(self, obj):
+        genres = registry.genres.get_many(
+            link.genre_id_id for link in obj.genre_title_set.all())
+        return GenreSerializer(genres, many=True).data
+
+    def get_category(self, obj):
+        category = registry.categories.get(obj.category_id)
+        if category is None:
+            return None
+        return CategorySerializer(category).data
+
+
+class TitleStatsSerializer(serializers.ModelSerializer):
+    """
+    Статистика отзывов произведения: распределение оценок от 1 до 10,
+    средняя оценка и число отзывов за последние 7 и 30 дней
+    (передаются в контексте как velocity).
+    """
+    reviews = serializers.IntegerField(source='total')
+    rating = serializers.FloatField()
+    distribution = serializers.DictField(
+        source='counts', child=serializers.IntegerField())
+    velocity = serializers.SerializerMethodField()
+
+    class Meta:
+        fields = ('title', 'reviews', 'rating', 'distribution', 'velocity')
+        model = ScoreHistogram
+
+    def get_velocity(self, obj):
+        return self.context['velocity']
+
+
+class SimilarTitleSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='similar_id')
+    name = serializers.CharField(source='similar.name')
+    year = serializers.IntegerField(source='similar.year')
+
+    class Meta:
+        fields = ('id', 'name', 'year', 'score')
+        model = SimilarTitle
+
+
+class RecommendationSerializer(serializers.Serializer):
+    id = serializers.IntegerField(source='similar')
+    name = serializers.CharField(source='similar__name')
+    year = serializers.IntegerField(source='similar__year')
+    weight = serializers.FloatField()
 
 
 class ReviewSerializer(serializers.ModelSerializer):
@@ -129,15 +206,19 @@ class ReviewSerializer(serializers.ModelSerializer):
         if self.context['request'].method != 'POST':
             return data
         user = self.context['request'].user
-        title = self.context['view'].kwargs['title_id']
-        if Review.objects.filter(author=user, title=title).exists():
+        title = self.context['view'].get_title()
+        # Архив произведения возвращается в рабочие таблицы только после
+        # проверки, поэтому отзыв архивного произведения ищется в архиве.
+        reviews = (title.archived_reviews if title.is_archived
+                   else title.reviews)
+        if reviews.filter(author=user).exists():
             raise serializers.ValidationError(
                 'Отзыв уже оставлен!'
             )
         return data
 
     class Meta:
-        fields = '__all__'
+        exclude = ('is_hidden',)
         model = Review
 
 
@@ -150,3 +231,99 @@ class CommentSerializer(serializers.ModelSerializer):
         fields = ('id', 'author', 'pub_date', 'text')
         model = Comments
         read_only_fields = ('id', 'author', 'pub_date')
+
+
+class ReviewActivitySerializer(serializers.ModelSerializer):
+    """Отзыв в ленте активности пользователя."""
+    type = serializers.SerializerMethodField()
+    title = serializers.PrimaryKeyRelatedField(read_only=True)
+    title_name = serializers.CharField(source='title.name', read_only=True)
+
+    class Meta:
+        fields = ('type', 'id', 'title', 'title_name', 'text', 'score',
+                  'pub_date')
+        model = Review
+
+    def get_type(self, obj):
+        return 'review'
+
+
+class CommentActivitySerializer(serializers.ModelSerializer):
+    """Комментарий в ленте активности пользователя."""
+    type = serializers.SerializerMethodField()
+    review = serializers.IntegerField(source='review_id_id', read_only=True)
+    title = serializers.IntegerField(
+        source='review_id.title_id', read_only=True)
+    title_name = serializers.CharField(
+        source='review_id.title.name', read_only=True)
+
+    class Meta:
+        fields = ('type', 'id', 'review', 'title', 'title_name', 'text',
+                  'pub_date')
+        model = Comments
+
+    def get_type(self, obj):
+        return 'comment'
+
+
+class ArchivedCommentActivitySerializer(CommentActivitySerializer):
+    """Архивный комментарий в ленте активности пользователя."""
+    review = serializers.IntegerField(source='review_id', read_only=True)
+    title = serializers.IntegerField(
+        source='review.title_id', read_only=True)
+    title_name = serializers.CharField(
+        source='review.title.name', read_only=True)
+
+    class Meta(CommentActivitySerializer.Meta):
+        model = ArchivedComment
+
+
+class JobSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        fields = ('id', 'kind', 'status', 'processed', 'total', 'attempts',
+                  'error', 'created', 'updated')
+        model = Job
+
+
+class ModerationSerializer(serializers.Serializer):
+    """
+    Массовое действие над отзывами или комментариями. Фильтры объединяются
+    через AND; нужен хотя бы один. text - фрагмент текста без учёта
+    регистра.
+    """
+    FILTERS = ('ids', 'author', 'title', 'since', 'until', 'text')
+
+    action = serializers.ChoiceField(choices=ModerationLog.ACTIONS)
+    target = serializers.ChoiceField(choices=ModerationLog.TARGETS)
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        required=False, allow_empty=False, max_length=10000)
+    author = serializers.CharField(required=False, max_length=150)
+    title = serializers.IntegerField(required=False, min_value=1)
+    since = serializers.DateTimeField(required=False)
+    until = serializers.DateTimeField(required=False)
+    text = serializers.CharField(
+        required=False, min_length=3, max_length=200)
+
+    def validate(self, data):
+        if not any(name in data for name in self.FILTERS):
+            raise serializers.ValidationError(
+                'Нужно указать хотя бы один фильтр: '
+                + ', '.join(self.FILTERS))
+        if ('since' in data and 'until' in data
+                and data['since'] >= data['until']):
+            raise serializers.ValidationError(
+                'Начало периода должно быть раньше конца.')
+        return data
+
+
+class ModerationLogSerializer(serializers.ModelSerializer):
+    moderator = serializers.CharField(source='moderator_username')
+    filters = serializers.JSONField(source='params')
+    job = JobSerializer()
+
+    class Meta:
+        fields = ('id', 'moderator', 'action', 'target', 'filters',
+                  'affected', 'job', 'created')
+        model = ModerationLog
@@ -0,0 +1,245 @@
+from datetime import timedelta
+
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from reviews.archive import archive_title
+from reviews.models import (ArchivedComment, Category, Comments, Review,
+                            ScoreHistogram, Title)
+from users.models import User
+
+
+class NestedRoutesQueriesTest(TestCase):
+    """
+    Число запросов к БД на вложенных маршрутах отзывов и комментариев:
+    родители загружаются одним запросом (api/resolvers.py), авторы и
+    произведения - через select_related.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='reader', email='r@ya.ru')
+        authors = [
+            User.objects.create(username=f'author{i}', email=f'a{i}@ya.ru')
+            for i in range(5)]
+        category = Category.objects.create(name='Фильмы', slug='films')
+        cls.title = Title.objects.create(
+            name='Фильм', year=2000, category=category)
+        cls.other_title = Title.objects.create(
+            name='Другой фильм', year=2001, category=category)
+        for author in authors:
+            review = Review.objects.create(
+                title=cls.title, author=author, text='Отзыв', score=7)
+            comment = Comments.objects.create(
+                review_id=review, author=author, text='Комментарий')
+        cls.review = review
+        cls.comment = comment
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def reviews_url(self, title):
+        return f'/api/v1/titles/{title.pk}/reviews/'
+
+    def comments_url(self):
+        return f'{self.reviews_url(self.title)}{self.review.pk}/comments/'
+
+    def test_review_list(self):
+        # Произведение с распределением оценок и страница отзывов;
+        # число отзывов берётся из распределения, без COUNT.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.reviews_url(self.title))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 5)
+        self.assertEqual(len(response.data['results']), 5)
+
+    def test_comment_list(self):
+        # Отзыв с произведением и страница комментариев; число
+        # комментариев - из Review.comments_count.
+        with self.assertNumQueries(2):
+            response = self.client.get(self.comments_url())
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+    def test_review_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'{self.reviews_url(self.title)}{self.review.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_comment_detail(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                f'{self.comments_url()}{self.comment.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_review_create(self):
+        # Произведение, проверка уникальности, INSERT и обновление
+        # распределения оценок.
+        with self.assertNumQueries(4):
+            response = self.client.post(
+                self.reviews_url(self.other_title),
+                {'text': 'Новый отзыв', 'score': 9})
+        self.assertEqual(response.status_code, 201)
+
+    def test_comment_create(self):
+        # Отзыв с произведением, INSERT и обновление счётчика комментариев.
+        with self.assertNumQueries(3):
+            response = self.client.post(
+                self.comments_url(), {'text': 'Новый комментарий'})
+        self.assertEqual(response.status_code, 201)
+
+
+class StaleCommentsCountTest(TestCase):
+    """
+    Счётчик комментариев, отставший от таблицы (отзыв создан до появления
+    Review.comments_count), не обрезает список и не ломает удаление.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(
+            username='moder', email='m@ya.ru', role='admin')
+        category = Category.objects.create(name='Фильмы', slug='films')
+        title = Title.objects.create(
+            name='Фильм', year=2000, category=category)
+        cls.review = Review.objects.create(
+            title=title, author=cls.user, text='Отзыв', score=7)
+        cls.comments = [
+            Comments.objects.create(
+                review_id=cls.review, author=cls.user, text='Комментарий')
+            for _ in range(7)]
+        Review.objects.filter(pk=cls.review.pk).update(comments_count=0)
+        cls.url = (f'/api/v1/titles/{title.pk}/reviews/'
+                   f'{cls.review.pk}/comments/')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 7)
+        self.assertIsNotNone(response.data['next'])
+        response = self.client.get(self.url, {'page': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_delete(self):
+        response = self.client.delete(f'{self.url}{self.comments[0].pk}/')
+        self.assertEqual(response.status_code, 204)
+        self.review.refresh_from_db()
+        self.assertEqual(self.review.comments_count, 0)
+
+
+class ArchiveRestoreTest(TestCase):
+    """
+    Архив произведения возвращается в рабочие таблицы только при записи,
+    прошедшей проверку данных и прав доступа.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='a@ya.ru')
+        self.other = User.objects.create(username='other', email='o@ya.ru')
+        self.title = Title.objects.create(name='Фильм', year=2000)
+        self.review = Review.objects.create(
+            title=self.title, author=self.author, text='Отзыв', score=5)
+        self.comment = Comments.objects.create(
+            review_id=self.review, author=self.author, text='Комментарий')
+        archive_title(self.title.pk, timezone.now() + timedelta(days=1))
+        self.client = APIClient()
+        self.review_url = (f'/api/v1/titles/{self.title.pk}/reviews/'
+                           f'{self.review.pk}/')
+        self.comment_url = f'{self.review_url}comments/{self.comment.pk}/'
+
+    def assertArchived(self, archived=True):
+        self.title.refresh_from_db()
+        self.assertEqual(self.title.is_archived, archived)
+
+    def test_invalid_review_keeps_archive(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.post(
+            f'/api/v1/titles/{self.title.pk}/reviews/',
+            {'text': 'Отзыв', 'score': 11})
+        self.assertEqual(response.status_code, 400)
+        self.assertArchived()
+
+    def test_duplicate_review_keeps_archive(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.post(
+            f'/api/v1/titles/{self.title.pk}/reviews/',
+            {'text': 'Отзыв', 'score': 7})
+        self.assertEqual(response.status_code, 400)
+        self.assertArchived()
+
+    def test_forbidden_update_keeps_archive(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.patch(self.review_url, {'score': 1})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.delete(self.comment_url)
+        self.assertEqual(response.status_code, 403)
+        self.assertArchived()
+
+    def test_update_restores_archive(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.patch(self.review_url, {'score': 9})
+        self.assertEqual(response.status_code, 200)
+        self.assertArchived(False)
+        histogram = ScoreHistogram.objects.get(title=self.title)
+        self.assertEqual((histogram.score_5, histogram.score_9), (0, 1))
+
+    def test_comment_create_restores_archive(self):
+        self.client.force_authenticate(self.other)
+        response = self.client.post(
+            f'{self.review_url}comments/', {'text': 'Ещё комментарий'})
+        self.assertEqual(response.status_code, 201)
+        self.assertArchived(False)
+        self.assertEqual(
+            Review.objects.get(pk=self.review.pk).comments_count, 2)
+
+    def test_comment_delete_restores_archive(self):
+        self.client.force_authenticate(self.author)
+        response = self.client.delete(self.comment_url)
+        self.assertEqual(response.status_code, 204)
+        self.assertArchived(False)
+        self.assertFalse(Comments.objects.exists())
+        self.assertFalse(ArchivedComment.objects.exists())
+
+
+class ArchivedActivityTest(TestCase):
+    """Отзывы и комментарии архивных произведений остаются в лентах."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create(username='author', email='a@ya.ru')
+        archived = Title.objects.create(name='Старый фильм', year=1990)
+        title = Title.objects.create(name='Фильм', year=2000)
+        for score, parent in ((5, archived), (8, title)):
+            review = Review.objects.create(
+                title=parent, author=cls.user, text='Отзыв', score=score)
+            Comments.objects.create(
+                review_id=review, author=cls.user, text='Комментарий')
+        archive_title(archived.pk, timezone.now() + timedelta(days=1))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reviews(self):
+        response = self.client.get('/api/v1/users/author/reviews/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [review['title_name'] for review in response.data['results']],
+            ['Фильм', 'Старый фильм'])
+
+    def test_activity(self):
+        response = self.client.get('/api/v1/users/me/activity/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [(item['type'], item['title_name'])
+             for item in response.data['results']],
+            [('comment', 'Фильм'), ('review', 'Фильм'),
+             ('comment', 'Старый фильм'), ('review', 'Старый фильм')])
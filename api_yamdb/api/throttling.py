@@ -0,0 +1,228 @@
+"""
+Ограничение частоты запросов по алгоритму token bucket.
+
+Корзины хранятся в общем хранилище: по умолчанию в памяти процесса
+(LocMemBucketStore), для нескольких воркеров - в Redis (RedisBucketStore).
+Хранилище и его параметры задаются настройкой THROTTLE_STORE.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Mapping
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+from api_yamdb import metrics
+
+logger = logging.getLogger(__name__)
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+class LocMemBucketStore:
+    """
+    Хранилище корзин в памяти процесса. Число корзин ограничено
+    параметром MAX_ENTRIES: при переполнении вытесняются самые старые.
+    """
+
+    def __init__(self, options):
+        self.max_entries = options.get('MAX_ENTRIES', 10000)
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key, capacity, rate, now):
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + max(0, now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait == 0, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore:
+    """
+    Общее для всех воркеров хранилище корзин в Redis. Списание токена
+    выполняется атомарно Lua-скриптом. При недоступности Redis запросы
+    пропускаются, чтобы сбой хранилища не отключал API.
+    """
+
+    SCRIPT = """
+        local capacity = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or capacity
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / rate
+        end
+        redis.call('HMSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('PEXPIRE', KEYS[1], math.ceil(capacity / rate * 1000))
+        return tostring(wait)
+    """
+
+    def __init__(self, options):
+        try:
+            import redis
+        except ImportError:
+            raise ImproperlyConfigured(
+                'Для RedisBucketStore требуется пакет redis.')
+        self.prefix = options.get('KEY_PREFIX', 'throttle')
+        self._client = redis.Redis.from_url(
+            options.get('URL', 'redis://localhost:6379/0'),
+            socket_timeout=options.get('SOCKET_TIMEOUT', 0.1),
+        )
+        self._script = self._client.register_script(self.SCRIPT)
+        self._errors = (redis.RedisError,)
+
+    def consume(self, key, capacity, rate, now):
+        try:
+            wait = float(self._script(
+                keys=[f'{self.prefix}:{key}'], args=[capacity, rate, now]))
+        except self._errors:
+            logger.warning('Хранилище троттлинга недоступно', exc_info=True)
+            return True, 0
+        return wait == 0, wait
+
+    def clear(self):
+        for key in self._client.scan_iter(f'{self.prefix}:*'):
+            self._client.delete(key)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    """Возвращает хранилище корзин, заданное настройкой THROTTLE_STORE."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'THROTTLE_STORE', {})
+                backend = import_string(config.get(
+                    'BACKEND', 'api.throttling.LocMemBucketStore'))
+                _store = backend(config.get('OPTIONS', {}))
+    return _store
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Базовый троттлинг по алгоритму token bucket. Ёмкость корзины и
+    скорость её пополнения задаются строкой вида 'число/период' в
+    DEFAULT_THROTTLE_RATES для области scope: '10/min' - не больше 10
+    запросов подряд, далее по одному каждые 6 секунд.
+    Потомки переопределяют get_ident_key().
+    """
+    scope = None
+    timer = time.time
+
+    def __init__(self):
+        self.capacity, self.rate = self.parse_rate(self.get_rate())
+        self._wait = None
+
+    def get_rate(self):
+        try:
+            return api_settings.DEFAULT_THROTTLE_RATES[self.scope]
+        except KeyError:
+            raise ImproperlyConfigured(
+                f'Не задан лимит для области "{self.scope}".')
+
+    def parse_rate(self, rate):
+        if rate is None:
+            return None, None
+        num, period = rate.split('/')
+        capacity = int(num)
+        return capacity, capacity / DURATIONS[period[0]]
+
+    def get_ident_key(self, request, view):
+        """
+        Ключ корзины внутри области. None - запрос не ограничивается.
+        """
+        raise NotImplementedError('.get_ident_key() must be overridden')
+
+    def allow_request(self, request, view):
+        if self.capacity is None:
+            return True
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return True
+        allowed, self._wait = get_store().consume(
+            f'{self.scope}:{ident}', self.capacity, self.rate, self.timer())
+        if not allowed:
+            metrics.THROTTLED.labels(self.scope).inc()
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+    def get_user_or_ip(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user:{request.user.pk}'
+        return f'ip:{self.get_ident(request)}'
+
+
+class AuthIPThrottle(TokenBucketThrottle):
+    """Ограничение запросов к эндпоинтам авторизации с одного IP."""
+    scope = 'auth_ip'
+
+    def get_ident_key(self, request, view):
+        return self.get_ident(request)
+
+
+class AuthUsernameThrottle(TokenBucketThrottle):
+    """
+    Ограничение попыток авторизации для одного username независимо от
+    IP: защищает короткие коды подтверждения от перебора.
+    """
+    scope = 'auth_username'
+
+    def get_ident_key(self, request, view):
+        # Тело запроса может быть списком или скаляром: его отклонит
+        # сериализатор.
+        if not isinstance(request.data, Mapping):
+            return None
+        username = request.data.get('username')
+        if not isinstance(username, str) or not username:
+            return None
+        return username.lower()
+
+
+class ReadThrottle(TokenBucketThrottle):
+    """Ограничение безопасных (читающих) запросов."""
+    scope = 'read'
+
+    def get_ident_key(self, request, view):
+        if request.method not in SAFE_METHODS:
+            return None
+        return self.get_user_or_ip(request)
+
+
+class ReviewWriteThrottle(TokenBucketThrottle):
+    """Ограничение создания и изменения отзывов и комментариев."""
+    scope = 'review_write'
+
+    def get_ident_key(self, request, view):
+        if request.method in SAFE_METHODS:
+            return None
+        return self.get_user_or_ip(request)
@@ -8,6 +8,8 @@ router.register(r'users', views.UserViewSet)
 router.register(r'categories', views.CategoriesViewSet)
 router.register(r'genres', views.GenresViewSet)
 router.register(r'titles', views.TitleViewSet)
+router.register(r'jobs', views.JobViewSet)
+router.register(r'moderation', views.ModerationViewSet)
 router.register(r'titles/(?P<title_id>\d+)/reviews',
                 views.ReviewViewSet, basename='reviews')
 router.register(r'titles/(?P<title_id>\d+)/reviews/(?P<review_id>\d+)'
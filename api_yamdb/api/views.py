@@ -1,17 +1,20 @@
 import random
+from datetime import timedelta
 from http import HTTPStatus
 
 from django.core.mail import send_mail
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Avg, F
+from django.conf import settings
+from django.http import Http404, HttpResponse
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
 
 from rest_framework import mixins, viewsets, filters, status
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from rest_framework.viewsets import GenericViewSet
-from rest_framework.decorators import action, api_view
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.decorators import action, api_view, throttle_classes
 from rest_framework.views import APIView
 from rest_framework import permissions
 from rest_framework.decorators import action
@@ -20,17 +23,57 @@ from rest_framework.decorators import action
 from .serializers import (CategorySerializer, GenreSerializer,
                           TitleSerializer, TitleGetSerializer,
                           ReviewSerializer, CommentSerializer)
-from reviews.models import Category, Genre, Title, Review
+from reviews.models import (Category, Genre, Title, Review, Comments,
+                            ScoreHistogram, SimilarTitle, ArchivedReview,
+                            ArchivedComment)
+from reviews.stats import count_histograms, rating_expression
 from .permissions import (IsAdminOrReadOnly,
                           IsModeratorAdminOrReadOnly)
 from .filters import TitlesFilter
 from users.models import User, EmailVerification
 from .serializers import (UserSerializer,
                           EmailVerificationSerializer, SignUpSerializer)
-from .permissions import IsAdminOrSuperuser
+from .permissions import (IsAdminOrSuperuser, HasMetricsToken,
+                          IsModeratorOrAdmin)
+from api_yamdb import metrics
+from .authentication import issue_token
+from .deletion import schedule_deletion
+from .models import Job, ModerationLog
+from .moderation import moderate
+from .pagination import CountedPageNumberPagination, KeysetPagination
+from .resolvers import ReviewChildMixin, TitleChildMixin
+from .serializers import (JobSerializer, TitleStatsSerializer,
+                          ReviewActivitySerializer, CommentActivitySerializer,
+                          ArchivedCommentActivitySerializer,
+                          SimilarTitleSerializer, RecommendationSerializer,
+                          ModerationSerializer, ModerationLogSerializer)
+from .throttling import (AuthIPThrottle, AuthUsernameThrottle,
+                         ReadThrottle, ReviewWriteThrottle)
+
+
+class AsyncDestroyMixin:
+    """
+    Удаление в фоновом режиме: при запросе DELETE с параметром
+    ?async=true зависимые объекты удаляются фоновой задачей пачками,
+    а в ответ возвращается задача (202 Accepted) для отслеживания
+    прогресса по адресу /jobs/{id}/.
+    """
+
+    def is_async_delete(self):
+        return self.request.query_params.get('async') in ('1', 'true')
 
+    def destroy(self, request, *args, **kwargs):
+        if not self.is_async_delete():
+            return super().destroy(request, *args, **kwargs)
+        return self.schedule_destroy(self.get_object())
 
-class UserViewSet(viewsets.ModelViewSet):
+    def schedule_destroy(self, instance):
+        job = schedule_deletion(instance)
+        return Response(JobSerializer(job).data,
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class UserViewSet(AsyncDestroyMixin, viewsets.ModelViewSet):
     """
     Основной вьюсет для представления данных о пользователях.
     Работает с основной моделью User. В зависимости от типа URL
@@ -43,7 +86,7 @@ class UserViewSet(viewsets.ModelViewSet):
 
     queryset = User.objects.all()
     serializer_class = UserSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = CountedPageNumberPagination
     lookup_field = 'username'
     permission_classes = (IsAdminOrSuperuser,)
 
@@ -51,15 +94,89 @@ class UserViewSet(viewsets.ModelViewSet):
             methods=['GET', 'PATCH'],
             permission_classes=[permissions.IsAuthenticated, ])
     def me(self, request):
-        user = get_object_or_404(User, username=request.user.username)
+        user = get_object_or_404(User, pk=request.user.pk)
         serializer = UserSerializer(
             user, data=request.data, partial=True)
         serializer.is_valid(raise_exception=True)
         serializer.save(role=user.role)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=True, methods=['GET'],
+            permission_classes=[permissions.AllowAny, ])
+    def reviews(self, request, username=None):
+        """
+        Отзывы пользователя от новых к старым, включая отзывы архивных
+        произведений.
+        """
+        user = self.get_object()
+        querysets = [
+            model.objects.filter(
+                author=user, is_hidden=False).select_related('title')
+            for model in (Review, ArchivedReview)
+        ]
+        paginator = KeysetPagination()
+        page = paginator.paginate_querysets(querysets, request, self)
+        serializer = ReviewActivitySerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(detail=False, methods=['GET'], url_path='me/activity',
+            permission_classes=[permissions.IsAuthenticated, ])
+    def activity(self, request):
+        """
+        Лента активности текущего пользователя: его отзывы и комментарии,
+        в том числе архивные, объединённые в порядке pub_date.
+        """
+        streams = (
+            (Review, 'title', ReviewActivitySerializer),
+            (Comments, 'review_id__title', CommentActivitySerializer),
+            (ArchivedReview, 'title', ReviewActivitySerializer),
+            (ArchivedComment, 'review__title',
+             ArchivedCommentActivitySerializer),
+        )
+        querysets = [
+            model.objects.filter(
+                author=request.user, is_hidden=False).select_related(related)
+            for model, related, _ in streams
+        ]
+        serializers = {model: serializer for model, _, serializer in streams}
+        paginator = KeysetPagination()
+        page = paginator.paginate_querysets(querysets, request, self)
+        data = [serializers[type(obj)](obj).data for obj in page]
+        return paginator.get_paginated_response(data)
+
+    @action(detail=False, methods=['GET'], url_path='me/recommendations',
+            permission_classes=[permissions.IsAuthenticated, ])
+    def recommendations(self, request):
+        """
+        Рекомендации: произведения, похожие на понравившиеся пользователю
+        (оценка не ниже LIKED_SCORE), которые он ещё не оценивал.
+        Вес - сумма близости к понравившимся произведениям.
+        """
+        config = getattr(settings, 'RECOMMENDATIONS', {})
+        liked_score = config.get('LIKED_SCORE', 7)
+        # Отзывы архивных произведений (reviews/archive.py) тоже
+        # учитываются.
+        reviewed = Review.objects.filter(author=request.user)
+        archived = ArchivedReview.objects.filter(author=request.user)
+        recommendations = (
+            SimilarTitle.objects
+            .filter(
+                Q(title__in=reviewed.filter(
+                    score__gte=liked_score).values('title'))
+                | Q(title__in=archived.filter(
+                    score__gte=liked_score).values('title')))
+            .exclude(similar__in=reviewed.values('title'))
+            .exclude(similar__in=archived.values('title'))
+            .values('similar', 'similar__name', 'similar__year')
+            .annotate(weight=Sum('score'))
+            .order_by('-weight', 'similar')[:config.get('LIMIT', 20)]
+        )
+        serializer = RecommendationSerializer(recommendations, many=True)
+        return Response(serializer.data)
+
 
 @api_view(['POST'])
+@throttle_classes([AuthIPThrottle, AuthUsernameThrottle])
 def signup(request):
     """
     View-функция для создания учетных записей. Обладает следующим функционалом:
@@ -82,13 +199,14 @@ def signup(request):
     confirmation_entry.confirmation_code = confirmation_code
     confirmation_entry.save()
 
-    send_mail(
+    sent = send_mail(
         'Код подтверждения',
         f'Ваш код подтверждения: {confirmation_code}',
         'mail@yamdb.com',
         (serializer.validated_data.get('email'),),
         fail_silently=True,
     )
+    metrics.MAIL.labels('sent' if sent else 'failed').inc()
 
     if valid_name in User.objects.values_list(
         'username', flat=True) or valid_email in User.objects.values_list(
@@ -106,8 +224,10 @@ class TokenGetView(APIView):
     (username) и код подтверждения (confirmation_code). На входе проверяет
     регистрировали ли ранее пользователя с таким именем.
     2. Проверяет соответствие проверочного кода выданному пользователю.
-    3. Возвращает токен.
+    3. Возвращает токен, если учётная запись активна.
+    Число попыток ограничено по IP и по username.
     """
+    throttle_classes = (AuthIPThrottle, AuthUsernameThrottle)
 
     def post(self, request):
         serializer = EmailVerificationSerializer(data=request.data)
@@ -118,8 +238,11 @@ class TokenGetView(APIView):
 
         if data.get('confirmation_code') == EmailVerification.objects.get(
                 username=user.username).confirmation_code:
-
-            token = RefreshToken.for_user(user).access_token
+            if not user.is_active:
+                return Response(
+                    {'detail': 'Учётная запись заблокирована.'},
+                    status=HTTPStatus.FORBIDDEN)
+            token = issue_token(user)
             return Response({'token': str(token)},
                             status=HTTPStatus.CREATED)
         return Response(
@@ -132,7 +255,7 @@ class ModelMixinSet(mixins.ListModelMixin, mixins.CreateModelMixin,
     pass
 
 
-class CategoriesViewSet(viewsets.ModelViewSet):
+class CategoriesViewSet(AsyncDestroyMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с категориями.
     Выдаёт информацию в сериализатор с пагинацией (по 5 записей).
@@ -157,6 +280,8 @@ class CategoriesViewSet(viewsets.ModelViewSet):
     )
     def delete_category_slug(self, request, slug):
         category = self.get_object()
+        if self.is_async_delete():
+            return self.schedule_destroy(category)
         serializer = CategorySerializer(category)
         category.delete()
         return Response(serializer.data, status=status.HTTP_204_NO_CONTENT)
@@ -176,16 +301,16 @@ class GenresViewSet(ModelMixinSet):
     lookup_field = 'slug'
 
 
-class TitleViewSet(viewsets.ModelViewSet):
+class TitleViewSet(AsyncDestroyMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с тайтлами.
     Выдаёт информацию в сериализатор с пагинацией (по 5 записей).
     """
     queryset = Title.objects.annotate(
-        rating=Avg(F('reviews__score'))
-    ).order_by('name')
+        rating=rating_expression()
+    ).prefetch_related('genre_title_set').order_by('name')
     serializer_class = TitleSerializer
-    pagination_class = PageNumberPagination
+    pagination_class = CountedPageNumberPagination
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = [DjangoFilterBackend]
     filterset_class = TitlesFilter
@@ -195,41 +320,206 @@ class TitleViewSet(viewsets.ModelViewSet):
             return TitleGetSerializer
         return TitleSerializer
 
-
-class ReviewViewSet(viewsets.ModelViewSet):
+    @action(detail=True, methods=['get'])
+    def stats(self, request, pk=None):
+        """
+        Статистика отзывов: распределение оценок берётся из
+        поддерживаемого сигналами ScoreHistogram (если его ещё нет -
+        считается по отзывам без сохранения), скорость появления
+        отзывов считается по индексу (title, pub_date).
+        """
+        title = self.get_object()
+        histogram = ScoreHistogram.objects.filter(title=title).first()
+        if histogram is None:
+            histogram = count_histograms([title.pk])[title.pk]
+        now = timezone.now()
+        reviews = title.reviews.filter(is_hidden=False)
+        velocity = {
+            f'last_{days}_days': reviews.filter(
+                pub_date__gte=now - timedelta(days=days)).count()
+            for days in (7, 30)
+        }
+        serializer = TitleStatsSerializer(
+            histogram, context={'velocity': velocity})
+        return Response(serializer.data)
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        Похожие произведения из таблицы SimilarTitle, рассчитанной
+        командой build_recommendations.
+        """
+        title = self.get_object()
+        similar = SimilarTitle.objects.filter(
+            title=title).select_related('similar').order_by('rank')
+        serializer = SimilarTitleSerializer(similar, many=True)
+        return Response(serializer.data)
+
+
+class ReviewViewSet(TitleChildMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с ревью, привязан к модели Title по id.
     Выдаёт информацию в сериализатор с пагинацией (по 5 записей).
+    Произведение загружается только для списка и создания отзыва,
+    для отдельного отзыва соответствие title_id проверяется тем же
+    запросом, которым загружается отзыв. Отзывы архивного произведения
+    читаются из ArchivedReview.
     """
     serializer_class = ReviewSerializer
     permission_classes = (IsModeratorAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
-
-    def title(self):
-        return get_object_or_404(Title, id=self.kwargs.get('title_id'))
+    pagination_class = CountedPageNumberPagination
+    throttle_classes = (ReadThrottle, ReviewWriteThrottle)
+    from_archive = False
 
     def get_queryset(self):
-        return self.title().reviews.all()
+        if getattr(self, 'swagger_fake_view', False):
+            return Review.objects.none()
+        if self.action in ('list', 'create'):
+            self.from_archive = self.get_title().is_archived
+        if self.from_archive:
+            return ArchivedReview.objects.filter(
+                title_id=self.kwargs.get('title_id'), is_hidden=False
+            ).annotate(
+                comments_count=Count(
+                    'comments', filter=Q(comments__is_hidden=False))
+            ).select_related('title', 'author')
+        return Review.objects.filter(
+            title_id=self.kwargs.get('title_id'), is_hidden=False
+        ).select_related('title', 'author')
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Отзыв мог быть перенесён в архив вместе с произведением.
+            if self.from_archive or not self.get_title().is_archived:
+                raise
+        self.from_archive = True
+        return super().get_object()
+
+    def get_maintained_count(self):
+        """Число отзывов - по распределению оценок произведения."""
+        try:
+            return self.get_title().histogram.total
+        except ScoreHistogram.DoesNotExist:
+            return None
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, title=self.title())
+        self.restore_archive()
+        serializer.save(author=self.request.user, title=self.get_title())
+
+    def perform_update(self, serializer):
+        serializer.instance = self.restore_archive(serializer.instance)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        self.restore_archive(instance).delete()
 
 
-class CommentViewSet(viewsets.ModelViewSet):
+class CommentViewSet(ReviewChildMixin, viewsets.ModelViewSet):
     """
     Вьюсет для работы с комментариями, привязан к модели Review по id.
     Выдаёт информацию в сериализатор с пагинацией (по 5 записей).
+    Комментарии к архивному отзыву читаются из ArchivedComment.
     """
     serializer_class = CommentSerializer
     permission_classes = (IsModeratorAdminOrReadOnly,)
-    pagination_class = PageNumberPagination
-
-    def review_id(self):
-        return get_object_or_404(Review, id=self.kwargs.get('review_id'),
-                                 title_id__id=self.kwargs.get('title_id'))
+    pagination_class = CountedPageNumberPagination
+    throttle_classes = (ReadThrottle, ReviewWriteThrottle)
+    from_archive = False
 
     def get_queryset(self):
-        return self.review_id().review_id.all()
+        if getattr(self, 'swagger_fake_view', False):
+            return Comments.objects.none()
+        if self.action in ('list', 'create'):
+            self.from_archive = isinstance(self.get_review(), ArchivedReview)
+        if self.from_archive:
+            return ArchivedComment.objects.filter(
+                review_id=self.kwargs.get('review_id'),
+                review__title_id=self.kwargs.get('title_id'),
+                is_hidden=False,
+            ).select_related('author')
+        return Comments.objects.filter(
+            review_id=self.kwargs.get('review_id'),
+            review_id__title_id=self.kwargs.get('title_id'),
+            is_hidden=False,
+        ).select_related('author')
+
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Комментарий мог быть перенесён в архив вместе с отзывом.
+            if self.from_archive or not isinstance(
+                    self.get_review(), ArchivedReview):
+                raise
+        self.from_archive = True
+        return super().get_object()
+
+    def get_maintained_count(self):
+        return self.get_review().comments_count
 
     def perform_create(self, serializer):
-        serializer.save(author=self.request.user, review_id=self.review_id())
+        self.restore_archive()
+        serializer.save(author=self.request.user, review_id=self.get_review())
+
+    def perform_update(self, serializer):
+        serializer.instance = self.restore_archive(serializer.instance)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        self.restore_archive(instance).delete()
+
+
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Вьюсет для отслеживания фоновых задач (например, удаления).
+    Доступен только администраторам.
+    """
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = (IsAdminOrSuperuser,)
+    pagination_class = PageNumberPagination
+
+
+class ModerationViewSet(mixins.CreateModelMixin, mixins.ListModelMixin,
+                        mixins.RetrieveModelMixin, GenericViewSet):
+    """
+    Массовая модерация отзывов и комментариев (api/moderation.py) и журнал
+    выполненных операций. Доступна модераторам и администраторам.
+    Небольшая операция выполняется сразу (200), большая - фоновой задачей
+    (202), её ход виден в поле job.
+    """
+    queryset = ModerationLog.objects.select_related('job')
+    permission_classes = (IsModeratorOrAdmin,)
+    pagination_class = PageNumberPagination
+
+    def get_serializer_class(self):
+        if self.action == 'create':
+            return ModerationSerializer
+        return ModerationLogSerializer
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        params = dict(serializer.validated_data)
+        operation = params.pop('action')
+        target = params.pop('target')
+        log = moderate(request.user, operation, target, params)
+        return Response(
+            ModerationLogSerializer(log).data,
+            status=(status.HTTP_202_ACCEPTED if log.job_id
+                    else status.HTTP_200_OK))
+
+
+class MetricsView(APIView):
+    """
+    Метрики в формате Prometheus. Доступны администраторам и сборщику
+    метрик с токеном METRICS_TOKEN.
+    """
+    permission_classes = (IsAdminOrSuperuser | HasMetricsToken,)
+    throttle_classes = ()
+
+    def get(self, request):
+        content, content_type = metrics.render()
+        return HttpResponse(content, content_type=content_type)
@@ -0,0 +1,106 @@
+"""
+Прогрев воркера перед приёмом запросов.
+
+То, что Django и DRF иначе делают при первом запросе (компиляция
+URL-шаблонов, импорт классов из настроек REST_FRAMEWORK, построение полей
+сериализаторов), а также загрузка справочников, отозванных токенов и
+готовой схемы OpenAPI выполняются при запуске воркера (api_yamdb/wsgi.py).
+Тяжёлые необязательные части (drf_yasg) по-прежнему загружаются лениво:
+схема читается, только если она уже собрана командой build_schema.
+Включается настройкой WARMUP['ENABLED'].
+"""
+import logging
+import os
+import time
+
+from django.conf import settings
+from django.db import connections
+from django.urls import get_resolver
+from rest_framework.serializers import BaseSerializer
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+API_SETTINGS = (
+    'DEFAULT_AUTHENTICATION_CLASSES',
+    'DEFAULT_PERMISSION_CLASSES',
+    'DEFAULT_THROTTLE_CLASSES',
+    'DEFAULT_RENDERER_CLASSES',
+    'DEFAULT_PARSER_CLASSES',
+    'DEFAULT_PAGINATION_CLASS',
+    'DEFAULT_CONTENT_NEGOTIATION_CLASS',
+)
+
+
+def warm_urls():
+    resolver = get_resolver()
+    # reverse_dict компилирует регулярные выражения всех маршрутов.
+    resolver.reverse_dict
+    resolver.resolve('/api/v1/titles/')
+
+
+def warm_api_settings():
+    for name in API_SETTINGS:
+        getattr(api_settings, name)
+
+
+def warm_serializers():
+    from . import serializers
+
+    for serializer_class in vars(serializers).values():
+        if (isinstance(serializer_class, type)
+                and issubclass(serializer_class, BaseSerializer)
+                and serializer_class.__module__ == serializers.__name__):
+            serializer_class(context={}).fields
+
+
+def warm_registries():
+    from reviews import registry
+    from users.revocations import revocations
+
+    registry.categories.refresh(force=True)
+    registry.genres.refresh(force=True)
+    revocations.refresh(force=True)
+
+
+def warm_schema():
+    from . import schema
+
+    if not schema.get_config()['ENABLED']:
+        return
+    for fmt in schema.FORMATS:
+        if os.path.exists(schema.artifact_path(fmt)):
+            schema.load(fmt)
+
+
+STEPS = (
+    ('urls', warm_urls),
+    ('api_settings', warm_api_settings),
+    ('serializers', warm_serializers),
+    ('registries', warm_registries),
+    ('schema', warm_schema),
+)
+
+
+def warm_up(force=False):
+    """
+    Выполняет шаги прогрева и возвращает их длительность в секундах.
+    Ошибка шага записывается в лог и не мешает запуску воркера.
+    """
+    if not force and not getattr(settings, 'WARMUP', {}).get('ENABLED'):
+        return {}
+    timings = {}
+    for name, step in STEPS:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Ошибка прогрева: %s', name)
+        timings[name] = time.perf_counter() - started
+    # Воркеры, запускаемые fork после прогрева (gunicorn --preload),
+    # не должны делить открытые соединения с БД.
+    connections.close_all()
+    logger.info('Прогрев воркера: %s', ', '.join(
+        f'{name} {seconds * 1000:.1f} мс'
+        for name, seconds in timings.items()))
+    return timings
@@ -0,0 +1,87 @@
+"""
+Метрики в формате Prometheus.
+
+Значения метрик хранятся в памяти процесса, а если задана переменная
+окружения PROMETHEUS_MULTIPROC_DIR - в файлах этого каталога (mmap),
+чтобы /metrics возвращал сумму по всем воркерам gunicorn. В этом режиме
+в конфигурации gunicorn нужен хук child_exit, вызывающий
+prometheus_client.multiprocess.mark_process_dead(worker.pid).
+"""
+import os
+
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY,
+                               CollectorRegistry, Counter, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import GaugeMetricFamily
+
+REQUESTS = Counter(
+    'yamdb_requests_total',
+    'Число обработанных запросов.',
+    ['route', 'method', 'status'],
+)
+LATENCY = Histogram(
+    'yamdb_request_latency_seconds',
+    'Время обработки запроса.',
+    ['route', 'method'],
+    buckets=(.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+)
+DB_QUERIES = Histogram(
+    'yamdb_request_db_queries',
+    'Число запросов к БД на один запрос к API.',
+    ['route', 'method'],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+CACHE_LOOKUPS = Counter(
+    'yamdb_cache_lookups_total',
+    'Обращения к кэшам процесса: result - hit или miss.',
+    ['cache', 'result'],
+)
+THROTTLED = Counter(
+    'yamdb_throttled_requests_total',
+    'Запросы, отклонённые троттлингом.',
+    ['scope'],
+)
+SHED = Counter(
+    'yamdb_shed_requests_total',
+    'Запросы, отклонённые при перегрузке воркера (503).',
+)
+MAIL = Counter(
+    'yamdb_mail_total',
+    'Отправка писем: result - sent или failed.',
+    ['result'],
+)
+
+
+class JobQueueCollector:
+    """Глубина очереди фоновых задач по типам, считается при сборе."""
+
+    def collect(self):
+        from django.db.models import Count
+
+        from api.models import Job
+
+        gauge = GaugeMetricFamily(
+            'yamdb_job_queue_depth',
+            'Число фоновых задач в очереди.',
+            labels=['kind'],
+        )
+        pending = (
+            Job.objects.filter(status=Job.PENDING).order_by()
+            .values_list('kind').annotate(count=Count('id'))
+        )
+        for kind, count in pending:
+            gauge.add_metric([kind], count)
+        yield gauge
+
+
+def render():
+    """Возвращает метрики всех воркеров и их content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    jobs = CollectorRegistry()
+    jobs.register(JobQueueCollector())
+    return (generate_latest(registry) + generate_latest(jobs),
+            CONTENT_TYPE_LATEST)
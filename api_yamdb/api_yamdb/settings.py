@@ -21,15 +21,39 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
-    'drf_yasg',
-    'reviews',
-    'users',
-    'api',
+    'reviews.apps.ReviewsConfig',
+    'users.apps.UsersConfig',
+    'api.apps.ApiConfig',
     'django_filters',
     'rest_framework_simplejwt',
 ]
 
+# Документация API (Swagger UI, ReDoc и схема OpenAPI). Схема строится
+# один раз командой manage.py build_schema или при первом обращении.
+API_DOCS = {
+    'ENABLED': os.getenv('API_DOCS_ENABLED', 'true').lower() == 'true',
+    'SCHEMA_DIR': os.path.join(BASE_DIR, 'schema'),
+    'CACHE_MAX_AGE': 3600,
+    # Идентификатор релиза в имени файла схемы. Если не задан, схема
+    # привязывается к хэшу исходников API (api/schema.py).
+    'RELEASE': os.getenv('RELEASE_ID', ''),
+}
+
+if API_DOCS['ENABLED']:
+    INSTALLED_APPS.append('drf_yasg')
+
+SWAGGER_SETTINGS = {
+    'SPEC_URL': '/swagger.json',
+}
+
+REDOC_SETTINGS = {
+    'SPEC_URL': '/swagger.json',
+}
+
 MIDDLEWARE = [
+    'api.middleware.MetricsMiddleware',
+    'api.middleware.LoadSheddingMiddleware',
+    'api.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -115,13 +139,122 @@ REST_FRAMEWORK = {
     #     'rest_framework.permissions.AllowAny',
     # ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.RevocableJWTAuthentication',
     ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 5,
+    # Число доверенных прокси перед приложением. При 0 IP клиента для
+    # троттлинга берётся из REMOTE_ADDR, а X-Forwarded-For, который клиент
+    # может подставить сам, не учитывается.
+    'NUM_PROXIES': int(os.getenv('NUM_PROXIES', 0)),
+    'DEFAULT_THROTTLE_CLASSES': (
+        'api.throttling.ReadThrottle',
+    ),
+    'DEFAULT_THROTTLE_RATES': {
+        'auth_ip': '20/min',
+        'auth_username': '5/min',
+        'read': '600/min',
+        'review_write': '30/min',
+    },
+}
+
+# Хранилище корзин троттлинга. Для нескольких воркеров:
+# 'BACKEND': 'api.throttling.RedisBucketStore',
+# 'OPTIONS': {'URL': 'redis://localhost:6379/0'}
+THROTTLE_STORE = {
+    'BACKEND': 'api.throttling.LocMemBucketStore',
+    'OPTIONS': {'MAX_ENTRIES': 10000},
+}
+
+# Сброс нагрузки (api/middleware.py). Лимит задаётся на процесс и
+# срабатывает, только если у воркера потоков больше лимита:
+# gunicorn --worker-class gthread --threads 32 при лимите 16.
+LOAD_SHEDDING = {
+    'MAX_CONCURRENT_REQUESTS': int(
+        os.getenv('MAX_CONCURRENT_REQUESTS', 16)),
+    'QUEUE_TIMEOUT': 0.1,
+    'RETRY_AFTER': 1,
 }
 
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': datetime.timedelta(days=15),
     'REFRESH_TOKEN_LIFETIME': datetime.timedelta(days=15),
 }
+
+# Как часто воркер дочитывает из БД отозванные токены, секунды
+# (users/revocations.py).
+TOKEN_REVOCATION = {
+    'CHECK_INTERVAL': 2,
+}
+
+# Отзывы и комментарии произведений без активности за INACTIVE_DAYS дней
+# переносятся в архив командой manage.py archive_titles.
+ARCHIVE = {
+    'INACTIVE_DAYS': 365,
+}
+
+# Прогрев воркера перед приёмом запросов (api/warmup.py, вызывается из
+# wsgi.py). Замеры запуска: manage.py startup_benchmark.
+WARMUP = {
+    'ENABLED': os.getenv('WARMUP_ENABLED', 'true').lower() == 'true',
+}
+
+# Размер пачки при фоновом удалении зависимых объектов.
+DELETION_BATCH_SIZE = 500
+
+# Фоновые задачи (api/jobs.py): задача в статусе RUNNING без отчёта о
+# прогрессе дольше STALE_TIMEOUT секунд считается брошенной и
+# перезапускается, но не больше MAX_ATTEMPTS раз.
+JOBS = {
+    'STALE_TIMEOUT': 600,
+    'MAX_ATTEMPTS': 3,
+}
+
+# Массовая модерация (api/moderation.py): операции больше SYNC_LIMIT
+# записей выполняются фоновой задачей.
+MODERATION = {
+    'SYNC_LIMIT': 500,
+}
+
+# Кэш хранит число строк больших таблиц для постраничного вывода
+# (api/pagination.py); общий кэш (Redis, Memcached) не обязателен.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Подсчёт числа записей в списках API (api/pagination.py): время жизни
+# закэшированной оценки PostgreSQL, размер таблицы, начиная с которого она
+# используется вместо точного подсчёта, и предел подсчёта отфильтрованных
+# выборок.
+PAGINATION_COUNT = {
+    'CACHE_TIMEOUT': 60,
+    'EXACT_COUNT_LIMIT': 10000,
+    'FILTERED_COUNT_LIMIT': 1000,
+}
+
+# Как часто воркер сверяет версию справочников категорий и жанров в БД,
+# секунды (reviews/registry.py).
+REFERENCE_REGISTRY_CHECK_INTERVAL = 5
+
+# Похожие произведения и рекомендации (manage.py build_recommendations).
+RECOMMENDATIONS = {
+    'TOP_K': 20,
+    'LIKED_SCORE': 7,
+    'LIMIT': 20,
+}
+
+# Токен сборщика метрик для /metrics (заголовок X-Metrics-Token).
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+
+# Профилирование запросов (api/profiling.py): по заголовку X-Profile с
+# токеном из manage.py profiles --token или выборочно по маршрутам,
+# например 'SAMPLING': {'title-list': 0.01}.
+PROFILING = {
+    'ENABLED': os.getenv('PROFILING_ENABLED', 'false').lower() == 'true',
+    'DIRECTORY': os.path.join(BASE_DIR, 'profiles'),
+    'MAX_FILES': 100,
+    'INTERVAL': 0.005,
+    'SAMPLING': {},
+}
@@ -1,22 +1,10 @@
 from django.contrib import admin
 from django.urls import include, path
 from django.views.generic import TemplateView
-from rest_framework import permissions
-from drf_yasg.views import get_schema_view
-from drf_yasg import openapi
 from django.conf.urls import url
 
-schema_view = get_schema_view(openapi.Info(
-                              title="Yamdb API",
-                              default_version='v1',
-                              description=('''Документация для
-                                            приложения проекта Yambd API'''),
-                              contact=openapi.Contact(email="admin@admin.ru"),
-                              license=openapi.License(name="BSD License"),
-                              ),
-                              public=True,
-                              permission_classes=(permissions.AllowAny,),
-                              )
+from api import schema
+from api.views import MetricsView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -26,11 +14,16 @@ urlpatterns = [
         name='redoc'
     ),
     path('api/', include('api.urls')),
-    url(r'^swagger(?P<format>\.json|\.yaml)$',
-        schema_view.without_ui(cache_timeout=0),
-        name='schema-json'),
-    url(r'^swagger/$', schema_view.with_ui('swagger', cache_timeout=0),
-        name='schema-swagger-ui'),
-    url(r'^redoc/$', schema_view.with_ui('redoc', cache_timeout=0),
-        name='schema-redoc'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
 ]
+
+if schema.get_config()['ENABLED']:
+    urlpatterns += [
+        url(r'^swagger(?P<format>\.json|\.yaml)$',
+            schema.schema_view,
+            name='schema-json'),
+        url(r'^swagger/$', schema.ui_view('swagger'),
+            name='schema-swagger-ui'),
+        url(r'^redoc/$', schema.ui_view('redoc'),
+            name='schema-redoc'),
+    ]
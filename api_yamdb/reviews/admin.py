@@ -4,6 +4,7 @@ from .models import Title
 from .models import Review
 from .models import Comments
 from .models import Genre
+from .paginators import EstimatedCountPaginator
 
 
 @admin.register(Category)
@@ -13,6 +14,7 @@ class CategoryAdmin(admin.ModelAdmin):
         'name',
         'slug'
     ]
+    search_fields = ['^slug', '^name']
 
 
 @admin.register(Title)
@@ -24,6 +26,12 @@ class TitlesAdmin(admin.ModelAdmin):
         'category',
         'description'
     ]
+    list_select_related = ['category']
+    list_filter = ['year']
+    search_fields = ['^name']
+    autocomplete_fields = ['category']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Genre)
@@ -33,6 +41,7 @@ class GenreAdmin(admin.ModelAdmin):
         'name',
         'slug'
     ]
+    search_fields = ['^slug', '^name']
 
 
 @admin.register(Review)
@@ -43,8 +52,15 @@ class ReviewAdmin(admin.ModelAdmin):
         'text',
         'author',
         'score',
-        'pub_date'
+        'pub_date',
+        'is_hidden'
     ]
+    list_select_related = ['title', 'author']
+    list_filter = ['pub_date', 'is_hidden']
+    search_fields = ['=author__username', '^title__name']
+    autocomplete_fields = ['title', 'author']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 @admin.register(Comments)
@@ -54,5 +70,13 @@ class CommentsAdmin(admin.ModelAdmin):
         'review_id',
         'text',
         'author',
-        'pub_date'
+        'pub_date',
+        'is_hidden'
     ]
+    list_select_related = ['review_id', 'author']
+    list_filter = ['pub_date', 'is_hidden']
+    search_fields = ['=author__username']
+    raw_id_fields = ['review_id']
+    autocomplete_fields = ['author']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -5,3 +5,13 @@ class ReviewsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'reviews'
     verbose_name = 'Сведения базы данных'
+
+    def ready(self):
+        from django.db.models.signals import post_migrate
+
+        from . import signals  # noqa: F401
+        from .stats import backfill
+
+        # Распределения оценок произведений, созданных до их появления,
+        # строятся при первом же manage.py migrate.
+        post_migrate.connect(backfill, sender=self)
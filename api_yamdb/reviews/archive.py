@@ -0,0 +1,156 @@
+"""
+Архив отзывов и комментариев неактивных произведений.
+
+Произведение неактивно, если у него нет отзывов и комментариев новее
+ARCHIVE['INACTIVE_DAYS'] дней. Его отзывы и комментарии целиком
+переносятся в таблицы ArchivedReview и ArchivedComment, поэтому рабочие
+таблицы Review и Comments с их индексами содержат только данные активных
+произведений. Архивные записи сохраняют id: API отдаёт их по прежним
+адресам (более медленным путём), а перед записью в архивное произведение
+его данные возвращаются в рабочие таблицы (restore).
+
+Перенос выполняется запросами INSERT ... SELECT и DELETE без загрузки
+записей в память и без сигналов, каждое произведение - в своей
+транзакции. Распределение оценок произведения при переносе не меняется.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+
+from .models import ArchivedComment, ArchivedReview, Comments, Review, Title
+
+# Пары полей (рабочая таблица, архив).
+REVIEW_FIELDS = (
+    ('id', 'id'),
+    ('title', 'title'),
+    ('text', 'text'),
+    ('author', 'author'),
+    ('score', 'score'),
+    ('pub_date', 'pub_date'),
+    ('is_hidden', 'is_hidden'),
+)
+COMMENT_FIELDS = (
+    ('id', 'id'),
+    ('review_id', 'review'),
+    ('text', 'text'),
+    ('author', 'author'),
+    ('pub_date', 'pub_date'),
+    ('is_hidden', 'is_hidden'),
+)
+
+
+def get_config():
+    config = {'INACTIVE_DAYS': 365}
+    config.update(getattr(settings, 'ARCHIVE', {}))
+    return config
+
+
+def archive_threshold():
+    return timezone.now() - timedelta(days=get_config()['INACTIVE_DAYS'])
+
+
+def insert_from(target, fields, queryset):
+    """Копирует строки выборки в таблицу модели target одним запросом."""
+    select = queryset.order_by().values_list(
+        *(source for source, _ in fields))
+    sql, params = select.query.sql_with_params()
+    quote = connection.ops.quote_name
+    columns = ', '.join(
+        quote(target._meta.get_field(name).column) for _, name in fields)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(target._meta.db_table)} ({columns}) {sql}',
+            params)
+        return cursor.rowcount
+
+
+def delete_rows(queryset):
+    """Удаляет строки выборки одним запросом, без сигналов."""
+    sql, params = queryset.order_by().values('pk').query.sql_with_params()
+    meta = queryset.model._meta
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'DELETE FROM {quote(meta.db_table)} '
+            f'WHERE {quote(meta.pk.column)} IN ({sql})', params)
+        return cursor.rowcount
+
+
+def inactive_titles(before):
+    """Неархивные произведения с отзывами, но без активности с before."""
+    reviews = Review.objects.filter(title=OuterRef('pk'))
+    return Title.objects.filter(is_archived=False).annotate(
+        has_reviews=Exists(reviews),
+        recent_reviews=Exists(reviews.filter(pub_date__gte=before)),
+        recent_comments=Exists(Comments.objects.filter(
+            review_id__title=OuterRef('pk'), pub_date__gte=before)),
+    ).filter(has_reviews=True, recent_reviews=False, recent_comments=False)
+
+
+def archive_title(title_id, before):
+    """
+    Переносит отзывы и комментарии произведения в архив, если оно всё ещё
+    неактивно. Возвращает число перенесённых записей.
+    """
+    with transaction.atomic():
+        # Блокировки произведения и его отзывов не дают добавить к ним
+        # отзыв или комментарий во время переноса.
+        title = inactive_titles(before).select_for_update().filter(
+            pk=title_id).first()
+        if title is None:
+            return 0
+        reviews = Review.objects.filter(title_id=title_id)
+        comments = Comments.objects.filter(review_id__title_id=title_id)
+        list(reviews.select_for_update().values_list('pk'))
+        moved = insert_from(ArchivedReview, REVIEW_FIELDS, reviews)
+        moved += insert_from(ArchivedComment, COMMENT_FIELDS, comments)
+        delete_rows(comments)
+        delete_rows(reviews)
+        Title.objects.filter(pk=title_id).update(is_archived=True)
+    return moved
+
+
+def restore(title):
+    """Возвращает отзывы и комментарии произведения в рабочие таблицы."""
+    with transaction.atomic():
+        locked = Title.objects.select_for_update().filter(
+            pk=title.pk, is_archived=True)
+        if locked.exists():
+            reviews = ArchivedReview.objects.filter(title_id=title.pk)
+            comments = ArchivedComment.objects.filter(
+                review__title_id=title.pk)
+            insert_from(
+                Review,
+                [(archived, hot) for hot, archived in REVIEW_FIELDS]
+                + [('comments_count', 'comments_count')],
+                reviews.annotate(comments_count=Count(
+                    'comments', filter=Q(comments__is_hidden=False))))
+            insert_from(
+                Comments,
+                [(archived, hot) for hot, archived in COMMENT_FIELDS],
+                comments)
+            delete_rows(comments)
+            delete_rows(reviews)
+            locked.update(is_archived=False)
+    title.is_archived = False
+
+
+def archive_inactive(before, batch_size=100):
+    """
+    Архивирует неактивные произведения пачками по batch_size и выдаёт
+    число перенесённых записей после каждой пачки. Прерванный запуск
+    можно повторить: уже перенесённые произведения не выбираются.
+    """
+    titles = inactive_titles(before).order_by('pk').values_list(
+        'pk', flat=True)
+    last = 0
+    while True:
+        batch = list(titles.filter(pk__gt=last)[:batch_size])
+        if not batch:
+            return
+        last = batch[-1]
+        yield len(batch), sum(
+            archive_title(title_id, before) for title_id in batch)
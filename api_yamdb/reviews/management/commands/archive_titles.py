@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from reviews import archive
+
+
+class Command(BaseCommand):
+    help = ('Переносит отзывы и комментарии произведений без активности '
+            'за последние --days дней (по умолчанию ARCHIVE'
+            "['INACTIVE_DAYS']) в архивные таблицы. Каждое произведение "
+            'переносится в своей транзакции, прерванный запуск можно '
+            'повторить.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int)
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        if options['days'] is None:
+            before = archive.archive_threshold()
+        else:
+            before = timezone.now() - timedelta(days=options['days'])
+        titles = moved = 0
+        for batch_titles, batch_moved in archive.archive_inactive(
+                before, options['batch_size']):
+            titles += batch_titles
+            moved += batch_moved
+            self.stdout.write(
+                f'Произведений: {titles}, перенесено записей: {moved}')
+        self.stdout.write(f'Готово. Произведений: {titles}, '
+                          f'перенесено записей: {moved}')
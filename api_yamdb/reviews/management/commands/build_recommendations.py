@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает похожие произведения (SimilarTitle) по оценкам '
+            'пользователей. Требует numpy и scipy.')
+
+    def add_arguments(self, parser):
+        config = getattr(settings, 'RECOMMENDATIONS', {})
+        parser.add_argument(
+            '--top-k', type=int, default=config.get('TOP_K', 20),
+            help='Сколько соседей хранить для каждого произведения.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='Строк матрицы в одной пачке расчёта.')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Число процессов для расчёта близости.')
+
+    def handle(self, *args, **options):
+        from reviews import recommendations
+
+        started = time.monotonic()
+        created = recommendations.build(
+            top_k=options['top_k'], chunk_size=options['chunk_size'],
+            workers=options['workers'])
+        self.stdout.write(
+            f'Сохранено пар: {created} '
+            f'за {time.monotonic() - started:.1f} с')
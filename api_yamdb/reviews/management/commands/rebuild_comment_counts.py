@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from reviews import stats
+from reviews.models import Review
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики комментариев отзывов пачками.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        review_ids = Review.objects.order_by('pk').values_list('pk', flat=True)
+        last = 0
+        done = 0
+        size = options['chunk_size']
+        while True:
+            chunk = list(review_ids.filter(pk__gt=last)[:size])
+            if not chunk:
+                break
+            last = chunk[-1]
+            stats.rebuild_comments(chunk)
+            done += len(chunk)
+        self.stdout.write(f'Пересчитано отзывов: {done}')
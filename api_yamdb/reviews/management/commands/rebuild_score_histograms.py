@@ -0,0 +1,52 @@
+from multiprocessing import Pool
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from reviews import stats
+from reviews.models import Title
+
+
+def rebuild_chunk(title_ids):
+    stats.rebuild(title_ids)
+    return len(title_ids)
+
+
+def close_connections():
+    # Дочерние процессы открывают собственные соединения с БД.
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает распределения оценок произведений по отзывам '
+            'пачками, при --workers > 1 - параллельно в нескольких '
+            'процессах.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=1)
+
+    def chunks(self, size):
+        title_ids = Title.objects.order_by('pk').values_list('pk', flat=True)
+        last = 0
+        while True:
+            chunk = list(title_ids.filter(pk__gt=last)[:size])
+            if not chunk:
+                return
+            last = chunk[-1]
+            yield chunk
+
+    def handle(self, *args, **options):
+        chunks = self.chunks(options['chunk_size'])
+        done = 0
+        if options['workers'] > 1:
+            chunks = list(chunks)
+            close_connections()
+            with Pool(options['workers'],
+                      initializer=close_connections) as pool:
+                for count in pool.imap_unordered(rebuild_chunk, chunks):
+                    done += count
+        else:
+            for chunk in chunks:
+                done += rebuild_chunk(chunk)
+        self.stdout.write(f'Пересчитано произведений: {done}')
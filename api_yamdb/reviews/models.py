@@ -1,4 +1,6 @@
-from django.db import models
+from contextlib import contextmanager
+
+from django.db import connection, models, transaction
 from users.models import User
 from .validators import validate_year
 from django.core.validators import MaxValueValidator, MinValueValidator
@@ -32,6 +34,7 @@ class Title(models.Model):
     year = models.IntegerField(
         verbose_name='Год произведения',
         validators=[validate_year],
+        db_index=True,
     )
     category = models.ForeignKey(
         Category,
@@ -51,6 +54,11 @@ class Title(models.Model):
         null=True,
         blank=True,
     )
+    is_archived = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Отзывы в архиве',
+    )
 
     class Meta:
         verbose_name = 'Произведение'
@@ -127,6 +135,16 @@ class Review(models.Model):
         verbose_name='Дата публикации',
         db_index=True,
     )
+    comments_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Число комментариев',
+    )
+    is_hidden = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Скрыт модератором',
+    )
 
     class Meta:
         verbose_name = 'Отзыв'
@@ -138,10 +156,138 @@ class Review(models.Model):
             ),
         ]
         ordering = ['pub_date']
+        indexes = [
+            models.Index(fields=['title', 'pub_date']),
+            models.Index(fields=['author', 'pub_date']),
+        ]
 
     def __str__(self):
         return self.text
 
+    # Запись отзыва и её учёт в распределении оценок (reviews/signals.py)
+    # выполняются в одной транзакции под блокировкой распределения,
+    # поэтому не пересекаются с его пересчётом (stats.rebuild).
+    def save(self, *args, **kwargs):
+        with ScoreHistogram.locked(self.title_id):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with ScoreHistogram.locked(self.title_id):
+            return super().delete(*args, **kwargs)
+
+
+class ScoreHistogram(models.Model):
+    """
+    Распределение оценок произведения: число отзывов с каждой оценкой
+    от 1 до 10. Поддерживается сигналами Review (reviews/signals.py),
+    используется для расчёта рейтинга и статистики произведения.
+    """
+    title = models.OneToOneField(
+        Title,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='histogram',
+        verbose_name='Произведение',
+    )
+    score_1 = models.PositiveIntegerField(default=0)
+    score_2 = models.PositiveIntegerField(default=0)
+    score_3 = models.PositiveIntegerField(default=0)
+    score_4 = models.PositiveIntegerField(default=0)
+    score_5 = models.PositiveIntegerField(default=0)
+    score_6 = models.PositiveIntegerField(default=0)
+    score_7 = models.PositiveIntegerField(default=0)
+    score_8 = models.PositiveIntegerField(default=0)
+    score_9 = models.PositiveIntegerField(default=0)
+    score_10 = models.PositiveIntegerField(default=0)
+
+    SCORES = range(1, 11)
+
+    class Meta:
+        verbose_name = 'Распределение оценок'
+        verbose_name_plural = 'Распределения оценок'
+
+    def __str__(self):
+        return str(self.title_id)
+
+    @classmethod
+    def lock(cls, title_ids):
+        """
+        Блокирует распределения произведений до конца транзакции. В БД
+        без SELECT ... FOR UPDATE (SQLite) запись и так выполняется одной
+        транзакцией за раз, и запрос не нужен.
+        """
+        if connection.features.has_select_for_update:
+            list(cls.objects.select_for_update().filter(
+                title_id__in=title_ids).order_by('pk').values_list('pk'))
+
+    @classmethod
+    @contextmanager
+    def locked(cls, title_id):
+        """Транзакция под блокировкой распределения произведения."""
+        if not connection.features.has_select_for_update:
+            yield
+            return
+        with transaction.atomic():
+            cls.lock([title_id])
+            yield
+
+    @property
+    def counts(self):
+        return {score: getattr(self, f'score_{score}')
+                for score in self.SCORES}
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    @property
+    def rating(self):
+        total = self.total
+        if not total:
+            return None
+        return sum(
+            score * count for score, count in self.counts.items()) / total
+
+
+class SimilarTitle(models.Model):
+    """
+    Похожие произведения: top-K соседей произведения по косинусной
+    близости оценок пользователей. Таблица пересчитывается командой
+    manage.py build_recommendations.
+    """
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='similar_titles',
+        verbose_name='Произведение',
+    )
+    similar = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Похожее произведение',
+    )
+    score = models.FloatField(
+        verbose_name='Близость',
+    )
+    rank = models.PositiveSmallIntegerField(
+        verbose_name='Место',
+    )
+
+    class Meta:
+        verbose_name = 'Похожее произведение'
+        verbose_name_plural = 'Похожие произведения'
+        ordering = ['title', 'rank']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['title', 'rank'],
+                name='unique_similar_rank'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.title_id} -> {self.similar_id}'
+
 
 class Comments(models.Model):
     review_id = models.ForeignKey(
@@ -163,12 +309,134 @@ class Comments(models.Model):
     pub_date = models.DateTimeField(
         auto_now_add=True,
         verbose_name='Дата публикации',
+        db_index=True,
+    )
+
+    is_hidden = models.BooleanField(
+        default=False,
+        editable=False,
+        verbose_name='Скрыт модератором',
     )
 
     class Meta:
         verbose_name = 'Комментарий'
         verbose_name_plural = 'Комментарии'
         ordering = ['pub_date']
+        indexes = [
+            models.Index(fields=['author', 'pub_date']),
+        ]
 
     def __str__(self):
         return self.text
+
+
+class ArchivedReview(models.Model):
+    """
+    Отзыв неактивного произведения, перенесённый из Review командой
+    manage.py archive_titles (reviews/archive.py). Сохраняет id отзыва.
+    """
+    id = models.IntegerField(
+        primary_key=True,
+    )
+    title = models.ForeignKey(
+        Title,
+        on_delete=models.CASCADE,
+        related_name='archived_reviews',
+        verbose_name='Произведение',
+    )
+    text = models.CharField(
+        max_length=200,
+        verbose_name='Отзыв',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор отзыва',
+    )
+    score = models.PositiveSmallIntegerField(
+        verbose_name='Рейтинг',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    is_hidden = models.BooleanField(
+        default=False,
+        verbose_name='Скрыт модератором',
+    )
+
+    class Meta:
+        verbose_name = 'Архивный отзыв'
+        verbose_name_plural = 'Архивные отзывы'
+        ordering = ['pub_date']
+        indexes = [
+            models.Index(fields=['author', 'pub_date']),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class ArchivedComment(models.Model):
+    """Комментарий к архивному отзыву. Сохраняет id комментария."""
+    id = models.IntegerField(
+        primary_key=True,
+    )
+    review = models.ForeignKey(
+        ArchivedReview,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Отзыв',
+    )
+    text = models.CharField(
+        max_length=200,
+        verbose_name='Комментарий',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='Автор комментария',
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации',
+    )
+
+    is_hidden = models.BooleanField(
+        default=False,
+        verbose_name='Скрыт модератором',
+    )
+
+    class Meta:
+        verbose_name = 'Архивный комментарий'
+        verbose_name_plural = 'Архивные комментарии'
+        ordering = ['pub_date']
+        indexes = [
+            models.Index(fields=['author', 'pub_date']),
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class RegistryVersion(models.Model):
+    """
+    Метка версии справочника в памяти воркеров (reviews/registry.py):
+    увеличивается при каждом изменении справочника. Хранится в БД, чтобы
+    изменение видели все процессы при любом бэкенде кэша.
+    """
+    name = models.CharField(
+        max_length=100,
+        primary_key=True,
+    )
+    version = models.PositiveIntegerField(
+        default=0,
+    )
+
+    class Meta:
+        verbose_name = 'Версия справочника'
+        verbose_name_plural = 'Версии справочников'
+
+    def __str__(self):
+        return f'{self.name}: {self.version}'
@@ -0,0 +1,39 @@
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк таблицы по статистике планировщика PostgreSQL.
+    Возвращает None для отфильтрованных выборок и других СУБД.
+    """
+    if queryset.query.where or queryset.query.distinct:
+        return None
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples FROM pg_class WHERE relname = %s',
+            [queryset.model._meta.db_table])
+        row = cursor.fetchone()
+    if row is None or row[0] < 0:
+        return None
+    return int(row[0])
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Пагинатор для больших таблиц: вместо COUNT(*) по всей таблице
+    использует оценку СУБД. Точный подсчёт выполняется для
+    отфильтрованных выборок и небольших таблиц.
+    """
+    exact_count_limit = 10000
+
+    @cached_property
+    def count(self):
+        estimate = estimate_count(self.object_list)
+        if estimate is None or estimate < self.exact_count_limit:
+            return super().count
+        return estimate
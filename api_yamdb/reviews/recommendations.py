@@ -0,0 +1,149 @@
+"""
+Расчёт похожих произведений (item-item) по матрице оценок Review.
+
+Оценки загружаются потоком в разреженную матрицу произведения x
+пользователи (SciPy CSR), центрируются по средней оценке пользователя и
+нормируются, после чего косинусная близость считается произведением
+матриц пачками строк в пуле процессов. Для каждого произведения
+сохраняются top-K соседей в таблицу SimilarTitle.
+
+Модуль требует numpy и scipy и импортируется только командой
+build_recommendations.
+"""
+import multiprocessing
+from itertools import chain
+
+import numpy as np
+from django.db import connections, transaction
+from scipy import sparse
+
+from .models import ArchivedReview, Review, SimilarTitle
+
+_matrix = None
+
+
+def load_scores(chunk_size=100000):
+    """
+    Загружает оценки рабочих и архивных отзывов в массивы numpy: id
+    произведений, id авторов и оценки. Память - около 9 байт на отзыв.
+    """
+    title_ids, author_ids, scores = [], [], []
+    rows = chain.from_iterable(
+        model.objects.filter(is_hidden=False).order_by().values_list(
+            'title_id', 'author_id', 'score').iterator(chunk_size=chunk_size)
+        for model in (Review, ArchivedReview)
+    )
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == chunk_size:
+            append_batch(batch, title_ids, author_ids, scores)
+            batch = []
+    append_batch(batch, title_ids, author_ids, scores)
+    return (np.concatenate(title_ids), np.concatenate(author_ids),
+            np.concatenate(scores))
+
+
+def append_batch(batch, title_ids, author_ids, scores):
+    array = np.array(batch, dtype=np.int64).reshape(-1, 3)
+    title_ids.append(array[:, 0])
+    author_ids.append(array[:, 1].astype(np.int32))
+    scores.append(array[:, 2].astype(np.int8))
+
+
+def build_matrix(title_ids, author_ids, scores):
+    """
+    Строит нормированную матрицу произведения x пользователи.
+    Возвращает матрицу и массив id произведений по номерам строк.
+    """
+    titles, rows = np.unique(title_ids, return_inverse=True)
+    authors, columns = np.unique(author_ids, return_inverse=True)
+    values = scores.astype(np.float32)
+    # Центрирование по средней оценке автора убирает разницу в строгости
+    # оценок разных пользователей (adjusted cosine).
+    totals = np.bincount(columns, weights=values, minlength=len(authors))
+    counts = np.bincount(columns, minlength=len(authors))
+    values -= (totals / counts).astype(np.float32)[columns]
+    matrix = sparse.csr_matrix(
+        (values, (rows, columns)), shape=(len(titles), len(authors)),
+        dtype=np.float32)
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1))).ravel()
+    norms[norms == 0] = 1
+    matrix = sparse.diags(1 / norms).dot(matrix).tocsr()
+    return matrix, titles
+
+
+def top_k_chunk(bounds, top_k):
+    """
+    Косинусная близость строк start:stop со всеми строками матрицы и
+    top-K соседей каждой строки: (номер строки, соседи, близость).
+    """
+    start, stop = bounds
+    similarity = _matrix[start:stop].dot(_matrix.T).tocsr()
+    result = []
+    for offset in range(stop - start):
+        row = start + offset
+        begin, end = similarity.indptr[offset], similarity.indptr[offset + 1]
+        neighbours = similarity.indices[begin:end]
+        values = similarity.data[begin:end]
+        keep = (neighbours != row) & (values > 0)
+        neighbours, values = neighbours[keep], values[keep]
+        if len(values) > top_k:
+            best = np.argpartition(-values, top_k)[:top_k]
+            neighbours, values = neighbours[best], values[best]
+        order = np.argsort(-values, kind='stable')
+        result.append((row, neighbours[order], values[order]))
+    return result
+
+
+def _run_chunk(args):
+    return top_k_chunk(*args)
+
+
+def build(top_k=20, chunk_size=1000, workers=1, batch_size=5000):
+    """Пересчитывает таблицу SimilarTitle. Возвращает число записей."""
+    global _matrix
+    title_ids, author_ids, scores = load_scores()
+    if not len(title_ids):
+        SimilarTitle.objects.all().delete()
+        return 0
+    _matrix, titles = build_matrix(title_ids, author_ids, scores)
+    del title_ids, author_ids, scores
+    chunks = [
+        ((start, min(start + chunk_size, _matrix.shape[0])), top_k)
+        for start in range(0, _matrix.shape[0], chunk_size)
+    ]
+    pool = None
+    if workers > 1:
+        # Процессы создаются до начала транзакции и получают матрицу
+        # через fork без копирования; соединения с БД им не нужны.
+        connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        results = pool.imap(_run_chunk, chunks)
+    else:
+        results = map(_run_chunk, chunks)
+    created = 0
+    try:
+        with transaction.atomic():
+            SimilarTitle.objects.all().delete()
+            batch = []
+            for chunk in results:
+                for row, neighbours, values in chunk:
+                    batch.extend(
+                        SimilarTitle(title_id=int(titles[row]),
+                                     similar_id=int(titles[neighbour]),
+                                     score=float(value), rank=rank)
+                        for rank, (neighbour, value) in enumerate(
+                            zip(neighbours, values), start=1))
+                if len(batch) >= batch_size:
+                    SimilarTitle.objects.bulk_create(batch)
+                    created += len(batch)
+                    batch = []
+            SimilarTitle.objects.bulk_create(batch)
+            created += len(batch)
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+        _matrix = None
+    return created
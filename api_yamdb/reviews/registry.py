@@ -0,0 +1,102 @@
+"""
+Справочники категорий и жанров в памяти процесса.
+
+Таблицы Category и Genre маленькие и меняются редко, поэтому каждый
+воркер держит их целиком в памяти и сверяет с меткой версии в таблице
+RegistryVersion не чаще раза в REFERENCE_REGISTRY_CHECK_INTERVAL секунд.
+Изменение справочника в любом воркере (сигналы reviews/signals.py)
+увеличивает метку, и остальные перечитывают таблицу. Метка хранится в
+БД, поэтому изменения доходят до всех процессов при любом бэкенде кэша.
+Если запись не найдена, метка сверяется сразу: объект, только что
+созданный в другом воркере, доступен без ожидания интервала.
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.db.models import F
+
+from api_yamdb import metrics
+from .models import Category, Genre, RegistryVersion
+
+
+class ReferenceRegistry:
+
+    def __init__(self, model):
+        self.model = model
+        self.name = model._meta.label_lower
+        self._lock = threading.Lock()
+        self._by_id = None
+        self._by_slug = None
+        self._version = None
+        self._checked = 0
+
+    def __deepcopy__(self, memo):
+        # Справочник общий для процесса: поля сериализаторов при
+        # копировании должны ссылаться на тот же объект.
+        return self
+
+    def refresh(self, force=False, check=False):
+        """
+        Перечитывает таблицу, если изменилась метка версии. Метка
+        сверяется не чаще раза в интервал, а при check=True - сразу.
+        """
+        now = time.monotonic()
+        interval = getattr(settings, 'REFERENCE_REGISTRY_CHECK_INTERVAL', 5)
+        if not force and not check and self._by_id is not None and (
+                now - self._checked < interval):
+            metrics.CACHE_LOOKUPS.labels(
+                self.model._meta.model_name, 'hit').inc()
+            return
+        version = RegistryVersion.objects.filter(
+            name=self.name).values_list('version', flat=True).first()
+        with self._lock:
+            stale = force or self._by_id is None or version != self._version
+            metrics.CACHE_LOOKUPS.labels(
+                self.model._meta.model_name, 'miss' if stale else 'hit').inc()
+            if stale:
+                objects = list(self.model.objects.all())
+                self._by_id = {obj.pk: obj for obj in objects}
+                self._by_slug = {obj.slug: obj for obj in objects}
+                self._version = version
+            self._checked = now
+
+    def invalidate(self):
+        """Увеличивает метку версии: все воркеры перечитают справочник."""
+        versions = RegistryVersion.objects.filter(name=self.name)
+        if not versions.update(version=F('version') + 1):
+            _, created = RegistryVersion.objects.get_or_create(
+                name=self.name, defaults={'version': 1})
+            if not created:
+                versions.update(version=F('version') + 1)
+        self._checked = 0
+
+    def get(self, pk):
+        if pk is None:
+            return None
+        self.refresh()
+        if pk not in self._by_id:
+            self.refresh(check=True)
+        return self._by_id.get(pk)
+
+    def get_many(self, pks):
+        self.refresh()
+        return [self._by_id[pk] for pk in pks if pk in self._by_id]
+
+    def get_by_slug(self, slug):
+        self.refresh()
+        if slug not in self._by_slug:
+            self.refresh(check=True)
+        return self._by_slug.get(slug)
+
+    def ids_containing(self, value):
+        """id записей, slug которых содержит value (без учёта регистра)."""
+        self.refresh()
+        value = value.lower()
+        return [
+            obj.pk for slug, obj in self._by_slug.items()
+            if value in slug.lower()]
+
+
+categories = ReferenceRegistry(Category)
+genres = ReferenceRegistry(Genre)
@@ -0,0 +1,93 @@
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_init, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import User
+from . import registry, stats
+from .models import (ArchivedReview, Category, Comments, Genre, Review,
+                     ScoreHistogram, Title)
+
+
+@receiver(post_save, sender=Title)
+def create_histogram(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        ScoreHistogram.objects.get_or_create(title=instance)
+
+
+def counted_score(review):
+    """Оценка, учтённая в распределении: скрытые отзывы не учитываются."""
+    return None if review.is_hidden else review.score
+
+
+@receiver(post_init, sender=Review)
+def remember_score(sender, instance, **kwargs):
+    instance._stored_score = counted_score(instance)
+
+
+@receiver(post_save, sender=Review)
+def count_saved_score(sender, instance, created, raw=False, **kwargs):
+    previous = None if created else instance._stored_score
+    instance._stored_score = counted_score(instance)
+    if raw or stats.is_suspended() or previous == instance._stored_score:
+        return
+    if previous is not None:
+        stats.adjust(instance.title_id, previous, -1)
+    if instance._stored_score is not None:
+        stats.adjust(instance.title_id, instance._stored_score, 1)
+
+
+@receiver(post_delete, sender=Review)
+def count_deleted_score(sender, instance, **kwargs):
+    if stats.is_suspended() or instance._stored_score is None:
+        return
+    stats.adjust(instance.title_id, instance._stored_score, -1)
+
+
+@receiver(pre_delete, sender=User)
+def remember_archived_titles(sender, instance, **kwargs):
+    # Архивные отзывы удаляются каскадом без сигналов: распределения их
+    # произведений пересчитываются после удаления пользователя.
+    instance._archived_title_ids = list(
+        ArchivedReview.objects.filter(author=instance, is_hidden=False)
+        .order_by().values_list('title_id', flat=True).distinct())
+
+
+@receiver(post_delete, sender=User)
+def count_deleted_archived_scores(sender, instance, **kwargs):
+    title_ids = getattr(instance, '_archived_title_ids', None)
+    if title_ids and not stats.is_suspended():
+        stats.rebuild(title_ids)
+
+
+@receiver(post_init, sender=Comments)
+def remember_visibility(sender, instance, **kwargs):
+    instance._stored_visible = not instance.is_hidden
+
+
+@receiver(post_save, sender=Comments)
+def count_saved_comment(sender, instance, created, raw=False, **kwargs):
+    previous = False if created else instance._stored_visible
+    instance._stored_visible = not instance.is_hidden
+    if raw or stats.is_suspended() or previous == instance._stored_visible:
+        return
+    stats.adjust_comments(
+        instance.review_id_id, 1 if instance._stored_visible else -1)
+
+
+@receiver(post_delete, sender=Comments)
+def count_deleted_comment(sender, instance, **kwargs):
+    if not stats.is_suspended() and instance._stored_visible:
+        stats.adjust_comments(instance.review_id_id, -1)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_categories(sender, **kwargs):
+    transaction.on_commit(registry.categories.invalidate)
+
+
+@receiver(post_save, sender=Genre)
+@receiver(post_delete, sender=Genre)
+def invalidate_genres(sender, **kwargs):
+    transaction.on_commit(registry.genres.invalidate)
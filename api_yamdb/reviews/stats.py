@@ -0,0 +1,170 @@
+"""
+Инкрементальное обновление и пересчёт распределений оценок (ScoreHistogram)
+и счётчиков комментариев отзывов (Review.comments_count).
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import connections, transaction
+from django.db.models import (Count, Exists, ExpressionWrapper, F,
+                              FloatField, OuterRef, Subquery)
+from django.db.models.functions import Coalesce, Greatest, NullIf
+
+from .models import (ArchivedReview, Comments, Review, ScoreHistogram,
+                     Title)
+
+_state = threading.local()
+
+
+def is_suspended():
+    return getattr(_state, 'suspended', False)
+
+
+@contextmanager
+def suspended():
+    """
+    Отключает инкрементальное обновление распределений и счётчиков
+    комментариев в текущем потоке. Используется массовыми операциями,
+    которые после себя вызывают rebuild() и rebuild_comments() для
+    затронутых объектов.
+    """
+    previous = is_suspended()
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = previous
+
+
+def adjust(title_id, score, delta):
+    """
+    Изменяет счётчик оценки score произведения на delta, не опуская его
+    ниже нуля.
+    """
+    field = f'score_{score}'
+    updated = ScoreHistogram.objects.filter(title_id=title_id).update(
+        **{field: Greatest(F(field) + delta, 0)})
+    if not updated and delta > 0:
+        # Распределения нет (произведение создано до его появления):
+        # оно строится по всем отзывам, включая только что сохранённый.
+        # Распределение удаляемого произведения заново не создаётся.
+        rebuild([title_id])
+
+
+def count_histograms(title_ids):
+    """Несохранённые распределения оценок по видимым отзывам."""
+    histograms = {
+        title_id: ScoreHistogram(title_id=title_id) for title_id in title_ids}
+    for model in (Review, ArchivedReview):
+        rows = (
+            model.objects.filter(title_id__in=title_ids, is_hidden=False)
+            .order_by()
+            .values_list('title_id', 'score')
+            .annotate(count=Count('id'))
+        )
+        for title_id, score, count in rows:
+            histogram = histograms[title_id]
+            field = f'score_{score}'
+            setattr(histogram, field, getattr(histogram, field) + count)
+    return histograms
+
+
+def rebuild(title_ids):
+    """
+    Пересчитывает распределения оценок произведений по видимым отзывам,
+    включая архивные. Распределения блокируются до подсчёта, поэтому
+    изменения отзывов (Review.save) ждут окончания пересчёта, а не
+    теряются при записи результата.
+    """
+    title_ids = sorted(set(title_ids))
+    with transaction.atomic():
+        # Недостающие распределения создаются, чтобы их тоже заблокировать.
+        ScoreHistogram.objects.bulk_create(
+            [ScoreHistogram(title_id=title_id) for title_id in title_ids],
+            ignore_conflicts=True)
+        ScoreHistogram.lock(title_ids)
+        ScoreHistogram.objects.bulk_update(
+            count_histograms(title_ids).values(),
+            [f'score_{score}' for score in ScoreHistogram.SCORES])
+
+
+def backfill_histograms(chunk_size=1000):
+    """
+    Строит распределения произведений, у которых их нет (созданных до
+    появления ScoreHistogram). Возвращает число произведений.
+    """
+    titles = Title.objects.filter(histogram__isnull=True).order_by(
+        'pk').values_list('pk', flat=True)
+    done = 0
+    last = 0
+    while True:
+        chunk = list(titles.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return done
+        last = chunk[-1]
+        rebuild(chunk)
+        done += len(chunk)
+
+
+def backfill_comments(chunk_size=1000):
+    """
+    Пересчитывает нулевые счётчики отзывов, у которых есть видимые
+    комментарии (созданных до появления Review.comments_count).
+    Возвращает число отзывов.
+    """
+    visible = Comments.objects.filter(
+        review_id=OuterRef('pk'), is_hidden=False)
+    reviews = Review.objects.filter(comments_count=0).annotate(
+        has_comments=Exists(visible)).filter(has_comments=True).order_by(
+        'pk').values_list('pk', flat=True)
+    done = 0
+    last = 0
+    while True:
+        chunk = list(reviews.filter(pk__gt=last)[:chunk_size])
+        if not chunk:
+            return done
+        last = chunk[-1]
+        rebuild_comments(chunk)
+        done += len(chunk)
+
+
+def backfill(using='default', **kwargs):
+    """Восполняет поддерживаемые счётчики после manage.py migrate."""
+    tables = connections[using].introspection.table_names()
+    if ScoreHistogram._meta.db_table not in tables:
+        # Таблицы приложения удалены (migrate reviews zero).
+        return
+    backfill_histograms()
+    backfill_comments()
+
+
+def adjust_comments(review_id, delta):
+    """
+    Изменяет счётчик комментариев отзыва на delta, не опуская его ниже нуля.
+    """
+    Review.objects.filter(pk=review_id).update(
+        comments_count=Greatest(F('comments_count') + delta, 0))
+
+
+def rebuild_comments(review_ids):
+    """Пересчитывает счётчики видимых комментариев отзывов."""
+    counts = (
+        Comments.objects.filter(review_id=OuterRef('pk'), is_hidden=False)
+        .order_by()
+        .values('review_id')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    Review.objects.filter(pk__in=list(review_ids)).update(
+        comments_count=Coalesce(Subquery(counts), 0))
+
+
+def rating_expression(prefix='histogram__'):
+    """Средняя оценка по распределению для аннотации выборки Title."""
+    total = sum(
+        F(f'{prefix}score_{score}') for score in ScoreHistogram.SCORES)
+    weighted = sum(
+        F(f'{prefix}score_{score}') * score
+        for score in ScoreHistogram.SCORES)
+    return ExpressionWrapper(
+        weighted * 1.0 / NullIf(total, 0), output_field=FloatField())
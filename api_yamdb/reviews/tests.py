@@ -0,0 +1,67 @@
+from datetime import timedelta
+
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from users.models import User
+from .archive import archive_title
+from .models import Category, Genre, Review, ScoreHistogram, Title
+from .registry import ReferenceRegistry
+
+
+@override_settings(REFERENCE_REGISTRY_CHECK_INTERVAL=60)
+class RegistryPropagationTest(TransactionTestCase):
+    """
+    Изменение справочника доходит до воркера, который его не выполнял и
+    не делит с выполнившим ни память, ни кэш.
+    """
+
+    def setUp(self):
+        Genre.objects.create(name='Драма', slug='drama')
+        # Справочник другого воркера, загруженный до изменения.
+        self.genres = ReferenceRegistry(Genre)
+        self.genres.refresh(force=True)
+
+    def test_created_object_is_found_at_once(self):
+        Genre.objects.create(name='Комедия', slug='comedy')
+        self.assertEqual(self.genres.get_by_slug('comedy').name, 'Комедия')
+
+    def test_deleted_object_disappears(self):
+        Genre.objects.filter(slug='drama').delete()
+        self.genres.refresh(check=True)
+        self.assertIsNone(self.genres.get_by_slug('drama'))
+
+    def test_missing_pk_makes_no_queries(self):
+        categories = ReferenceRegistry(Category)
+        categories.refresh(force=True)
+        with self.assertNumQueries(0):
+            self.assertIsNone(categories.get(None))
+
+
+class DeletedAuthorScoresTest(TestCase):
+    """
+    Удаление пользователя убирает его оценки из распределений, в том
+    числе оценки архивных отзывов, удаляемые каскадом без сигналов.
+    """
+
+    def setUp(self):
+        self.author = User.objects.create(username='author', email='a@ya.ru')
+        other = User.objects.create(username='other', email='o@ya.ru')
+        self.title = Title.objects.create(name='Фильм', year=2000)
+        Review.objects.create(
+            title=self.title, author=self.author, text='Отзыв', score=9)
+        Review.objects.create(
+            title=self.title, author=other, text='Отзыв', score=3)
+
+    def histogram(self):
+        return ScoreHistogram.objects.get(title=self.title)
+
+    def test_archived_reviews(self):
+        archive_title(self.title.pk, timezone.now() + timedelta(days=1))
+        self.author.delete()
+        self.assertEqual(self.histogram().total, 1)
+        self.assertEqual(self.histogram().score_9, 0)
+
+    def test_active_reviews(self):
+        self.author.delete()
+        self.assertEqual(self.histogram().total, 1)
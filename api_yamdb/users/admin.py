@@ -1,5 +1,19 @@
 from django.contrib import admin
 
+from reviews.paginators import EstimatedCountPaginator
 from .models import User
 
-admin.site.register(User)
+
+@admin.register(User)
+class UserAdmin(admin.ModelAdmin):
+    list_display = [
+        'id',
+        'username',
+        'email',
+        'role',
+        'is_active'
+    ]
+    list_filter = ['role', 'is_active']
+    search_fields = ['^username', '=email']
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
@@ -15,6 +15,7 @@ class User(AbstractUser):
         choices=role_choices.ROLES,
         max_length=role_choices.max_length,
         default=role_choices.ROLES[0][0],
+        db_index=True,
     )
     bio = models.TextField(
         blank=True,
@@ -22,6 +23,7 @@ class User(AbstractUser):
     email = models.EmailField(
         blank=False,
         max_length=150,
+        db_index=True,
     )
     username = models.CharField(
         max_length=150,
@@ -66,3 +68,27 @@ class EmailVerification(models.Model):
         max_length=4,
         null=True,
     )
+
+
+class TokenRevocation(models.Model):
+    """
+    Отзыв токенов пользователя: токены, выданные не позже revoked_before,
+    недействительны. Хранит id, а не ссылку на пользователя, чтобы запись
+    пережила удаление пользователя до истечения срока его токенов.
+    """
+
+    user_id = models.BigIntegerField(
+        unique=True,
+    )
+    revoked_before = models.DateTimeField()
+    updated = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+    )
+
+    class Meta:
+        verbose_name = 'Отзыв токенов'
+        verbose_name_plural = 'Отзывы токенов'
+
+    def __str__(self):
+        return f'{self.user_id}: {self.revoked_before}'
@@ -0,0 +1,97 @@
+"""
+Отзыв выданных токенов доступа в памяти процесса.
+
+Каждый воркер держит словарь "id пользователя -> момент отзыва" и не
+чаще раза в TOKEN_REVOCATION['CHECK_INTERVAL'] секунд дочитывает из БД
+записи TokenRevocation, изменённые с прошлой сверки. Источник правды -
+сама таблица, общая для всех процессов, поэтому отзыв доходит до каждого
+воркера за CHECK_INTERVAL секунд при любом бэкенде кэша, а проверка
+токена обращается к БД не чаще раза в интервал. Записи старше срока жизни
+токена не нужны: выданные до них токены уже истекли.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from rest_framework_simplejwt.settings import api_settings
+
+from api_yamdb import metrics
+from .models import TokenRevocation
+
+# Запас при дочитывании: запись, изменённая незадолго до прошлой сверки,
+# могла быть зафиксирована в БД уже после неё.
+SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def get_config():
+    config = {'CHECK_INTERVAL': 2}
+    config.update(getattr(settings, 'TOKEN_REVOCATION', {}))
+    return config
+
+
+def horizon():
+    """Отзывы раньше этого момента больше не действуют ни на один токен."""
+    return timezone.now() - api_settings.ACCESS_TOKEN_LIFETIME
+
+
+class RevocationList:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cutoffs = None
+        self._synced = None
+        self._checked = 0
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self._cutoffs is not None and (
+                now - self._checked < get_config()['CHECK_INTERVAL']):
+            metrics.CACHE_LOOKUPS.labels('revocations', 'hit').inc()
+            return
+        with self._lock:
+            metrics.CACHE_LOOKUPS.labels('revocations', 'miss').inc()
+            self.load()
+            self._checked = now
+
+    def load(self):
+        expired = horizon()
+        rows = TokenRevocation.objects.filter(revoked_before__gt=expired)
+        if self._cutoffs is None:
+            cutoffs = {}
+        else:
+            rows = rows.filter(updated__gte=self._synced - SYNC_OVERLAP)
+            cutoffs = {
+                user_id: cutoff for user_id, cutoff in self._cutoffs.items()
+                if cutoff > expired}
+        synced = self._synced
+        for user_id, cutoff, updated in rows.values_list(
+                'user_id', 'revoked_before', 'updated'):
+            cutoffs[user_id] = cutoff
+            synced = updated if synced is None else max(synced, updated)
+        # Словарь заменяется целиком: читающие потоки не берут блокировку.
+        self._cutoffs = cutoffs
+        self._synced = synced or timezone.now()
+
+    def invalidate(self):
+        """Текущий воркер дочитает отзывы при следующей проверке."""
+        self._checked = 0
+
+    def is_revoked(self, user_id, issued_at):
+        self.refresh()
+        cutoff = self._cutoffs.get(user_id)
+        return cutoff is not None and issued_at <= cutoff
+
+
+revocations = RevocationList()
+
+
+def revoke(user_id):
+    """Отзывает все выданные пользователю токены."""
+    now = timezone.now()
+    TokenRevocation.objects.update_or_create(
+        user_id=user_id, defaults={'revoked_before': now})
+    TokenRevocation.objects.filter(revoked_before__lte=horizon()).delete()
+    transaction.on_commit(revocations.invalidate)
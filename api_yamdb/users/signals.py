@@ -0,0 +1,32 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import User
+from .revocations import revoke
+
+# Поля пользователя, записанные в токен (api/authentication.py): при их
+# изменении выданные пользователю токены отзываются.
+TOKEN_FIELDS = ('username', 'role', 'is_superuser', 'is_staff', 'is_active')
+
+
+def token_state(user):
+    # Отложенные (defer) поля не загружаются ради сравнения.
+    return tuple(user.__dict__.get(field) for field in TOKEN_FIELDS)
+
+
+@receiver(post_init, sender=User)
+def remember_token_state(sender, instance, **kwargs):
+    instance._stored_token_state = token_state(instance)
+
+
+@receiver(post_save, sender=User)
+def revoke_on_change(sender, instance, created, raw=False, **kwargs):
+    previous = instance._stored_token_state
+    instance._stored_token_state = token_state(instance)
+    if not created and not raw and previous != instance._stored_token_state:
+        revoke(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def revoke_on_delete(sender, instance, **kwargs):
+    revoke(instance.pk)
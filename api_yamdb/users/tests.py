@@ -0,0 +1,36 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from .models import User
+from .revocations import RevocationList
+
+
+@override_settings(TOKEN_REVOCATION={'CHECK_INTERVAL': 0})
+class RevocationPropagationTest(TestCase):
+    """
+    Отзыв токенов доходит до воркера, который сам его не выполнял и не
+    делит с выполнившим ни память, ни кэш.
+    """
+
+    def setUp(self):
+        self.user = User.objects.create(username='admin', role='admin')
+        self.issued = timezone.now() - timedelta(minutes=1)
+        # Список другого воркера, загруженный до отзыва.
+        self.worker = RevocationList()
+        self.worker.refresh(force=True)
+
+    def test_role_change_reaches_other_worker(self):
+        self.assertFalse(self.worker.is_revoked(self.user.pk, self.issued))
+        self.user.role = 'user'
+        self.user.save()
+        cache.clear()
+        self.assertTrue(self.worker.is_revoked(self.user.pk, self.issued))
+
+    def test_token_issued_after_revocation_is_valid(self):
+        self.user.is_active = False
+        self.user.save()
+        self.assertFalse(self.worker.is_revoked(
+            self.user.pk, timezone.now() + timedelta(seconds=1)))